@@ -0,0 +1,157 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.cache import cache as shared_cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.forms.models import BaseModelFormSet
+from django.utils.functional import cached_property
+
+
+class SharedLabelsSelect(AutocompleteSelect):
+    """Автодополнение, которое подписывает выбранное значение из общего
+    для всех строк списка словаря, а не отдельным запросом на строку."""
+
+    labels = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = [
+            str(item) for item in value
+            if str(item) not in self.choices.field.empty_values
+        ]
+        if self.labels is None or not set(selected) <= self.labels.keys():
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        for pk in selected:
+            options.append(self.create_option(
+                name, pk, self.labels[pk], True, len(options)
+            ))
+        return [(None, options, 0)]
+
+
+class SharedLabelsFormSet(BaseModelFormSet):
+    """Формы list_editable с подписями связанных объектов на всю страницу.
+
+    Подписи берутся из объектов, уже загруженных list_select_related,
+    поэтому страница из сотни строк не делает ни одного запроса на
+    выпадающие списки и не выводит все варианты в каждой строке.
+    """
+
+    @cached_property
+    def shared_labels(self):
+        return {}
+
+    def labels(self, name):
+        if name not in self.shared_labels:
+            related = (getattr(obj, name) for obj in self.get_queryset())
+            self.shared_labels[name] = {
+                str(obj.pk): str(obj) for obj in related if obj is not None
+            }
+        return self.shared_labels[name]
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name, field in form.fields.items():
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, SharedLabelsSelect):
+                widget.labels = self.labels(name)
+        return form
+
+
+class SharedChoicesAdmin(admin.ModelAdmin):
+    """Список, в котором внешние ключи list_editable выбираются
+    автодополнением с общими для страницы подписями."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', SharedLabelsSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            ))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault('formset', SharedLabelsFormSet)
+        return super().get_changelist_formset(request, **kwargs)
+
+
+def estimated_rows(model):
+    """Оценка числа строк таблицы по статистике планировщика PostgreSQL."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки без COUNT(*) на каждой странице.
+
+    Размер всей большой таблицы в PostgreSQL берется из статистики
+    планировщика. Остальные счетчики считаются точно и хранятся в кеше
+    ADMIN_COUNT_TIMEOUT секунд по тексту запроса.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where and connection.vendor == 'postgresql':
+            estimate = estimated_rows(self.object_list.model)
+            if estimate >= settings.ADMIN_ESTIMATE_MIN_ROWS:
+                return estimate
+        try:
+            sql = str(query)
+        except EmptyResultSet:
+            return 0
+        return shared_cache.get_or_set(
+            f'admin-count:{hashlib.md5(sql.encode()).hexdigest()}',
+            self.object_list.count,
+            settings.ADMIN_COUNT_TIMEOUT,
+        )
+
+
+def is_autocomplete(request):
+    """Запрос пришел от виджета автодополнения, а не из списка объектов."""
+    match = request.resolver_match
+    return bool(match and (match.url_name or '').endswith('_autocomplete'))
+
+
+class PrefixSearchMixin:
+    """Поиск по началу значения диапазоном по индексу для автодополнения.
+
+    Поля prefix_search_fields сравниваются как value >= term и
+    value < term + '\U0010ffff': такой запрос идет по обычному индексу
+    столбца, в отличие от LIKE и icontains. Поиск чувствителен
+    к регистру, поэтому список объектов ищет как обычно, по
+    search_fields.
+    """
+
+    prefix_search_fields = ()
+
+    def get_search_fields(self, request):
+        if is_autocomplete(request):
+            return self.prefix_search_fields
+        return super().get_search_fields(request)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not is_autocomplete(request):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for field in self.prefix_search_fields:
+            condition |= Q(**{
+                f'{field}__gte': term, f'{field}__lt': f'{term}\U0010ffff'
+            })
+        return queryset.filter(condition), False
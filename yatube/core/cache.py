@@ -0,0 +1,143 @@
+import math
+import os
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from . import metrics
+
+
+def get_or_build(key, build, timeout, cache=default_cache):
+    """Значение из кеша с защитой от одновременной пересборки.
+
+    Рядом со значением хранится время его сборки и срок годности.
+    Незадолго до истечения запись с растущей вероятностью считается
+    устаревшей (вероятностное раннее обновление), а пересобирает ее только
+    тот процесс, который взял блокировку; остальные отдают старую копию.
+    Если записи нет совсем, процессы без блокировки ждут ее появления
+    не дольше CACHE_LOCK_WAIT секунд.
+    """
+    entry = cache.get(key)
+    if entry is not None and not _expiring(entry):
+        metrics.cache_result('fragment', True)
+        return entry[0]
+    lock_key = f'{key}:lock'
+    token = acquire(lock_key, settings.CACHE_LOCK_TIMEOUT, cache=cache)
+    if token is None:
+        if entry is not None:
+            metrics.cache_result('fragment', True)
+            return entry[0]
+        entry = _wait_for(key, cache)
+        if entry is not None:
+            metrics.cache_result('fragment', True)
+            return entry[0]
+    metrics.cache_result('fragment', False)
+    try:
+        started = time.monotonic()
+        value = build()
+        cost = time.monotonic() - started
+        cache.set(key, (value, cost, time.time() + timeout), timeout)
+    finally:
+        if token is not None:
+            release(lock_key, token, cache=cache)
+    return value
+
+
+def acquire(key, timeout, cache=default_cache):
+    """Берет блокировку key на timeout секунд; возвращает токен или None.
+
+    memcached и redis выполняют add() атомарно. У файлового кеша add() —
+    это проверка и запись двумя шагами, поэтому для него блокировка —
+    отдельный файл, созданный с O_EXCL.
+    """
+    token = uuid.uuid4().hex
+    if isinstance(cache, FileBasedCache):
+        locked = _acquire_file(_lock_path(cache, key), token, timeout)
+    else:
+        locked = cache.add(key, token, timeout)
+    return token if locked else None
+
+
+def release(key, token, cache=default_cache):
+    """Снимает блокировку, только если ее держит владелец token.
+
+    Блокировку, истекшую за время сборки, мог взять другой процесс:
+    ее удалять нельзя.
+    """
+    if isinstance(cache, FileBasedCache):
+        path = _lock_path(cache, key)
+        if _read_token(path) == token:
+            _remove(path)
+    elif cache.get(key) == token:
+        cache.delete(key)
+
+
+def _expiring(entry):
+    _, cost, expires = entry
+    # -log(random()) > 0 и редко бывает большим: чем дороже сборка и
+    # ближе срок, тем чаще запрос берется обновить запись заранее.
+    gap = -math.log(1.0 - random.random()) * cost
+    return time.time() + gap * settings.CACHE_EARLY_REFRESH_BETA >= expires
+
+
+def _wait_for(key, cache):
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _lock_path(cache, key):
+    # Файлы *.lock не попадают в cull() и clear() файлового кеша.
+    return f'{cache._key_to_file(key)}.lock'
+
+
+def _acquire_file(path, token, timeout):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not _break_expired(path, timeout):
+                return False
+            continue
+        with os.fdopen(fd, 'w') as lock_file:
+            lock_file.write(token)
+        return True
+    return False
+
+
+def _break_expired(path, timeout):
+    """Убирает блокировку упавшего процесса; True, если файла больше нет."""
+    try:
+        if time.time() - os.path.getmtime(path) < timeout:
+            return False
+        # Переименование атомарно: истекший файл заберет один процесс.
+        stale = f'{path}.{uuid.uuid4().hex}'
+        os.rename(path, stale)
+    except FileNotFoundError:
+        return True
+    _remove(stale)
+    return True
+
+
+def _read_token(path):
+    try:
+        with open(path) as lock_file:
+            return lock_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из outbox: отложенные, упавшие и оставшиеся '
+        'после остановки процесса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти'
+        )
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Сколько задач забирать за один проход'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза в секундах, когда задач нет'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            done = tasks.drain(options['batch'])
+            total += done
+            if done:
+                self.stdout.write(f'Выполнено задач: {total}')
+                continue
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Готово, задач: {total}'))
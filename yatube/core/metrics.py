@@ -0,0 +1,183 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = 'unresolved'
+
+current = ContextVar('metrics_sample', default=None)
+
+
+class Sample:
+    """Подробные замеры одного выбранного для сэмплирования запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache = defaultdict(lambda: [0, 0])
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обертка execute_wrapper: засекает каждый запрос к базе.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def template_rendered(seconds):
+    sample = current.get()
+    if sample is not None:
+        sample.template_time += seconds
+
+
+def cache_result(kind, hit):
+    """Отмечает попадание или промах кеша в текущем запросе.
+
+    kind — что читалось: fragment, version, lookup. Вне сэмплируемого
+    запроса ничего не делает.
+    """
+    sample = current.get()
+    if sample is not None:
+        sample.cache[kind][0 if hit else 1] += 1
+
+
+class Registry:
+    """Счетчики по именам view в памяти процесса.
+
+    Каждый воркер считает свои запросы; Prometheus собирает их со всех
+    воркеров и суммирует по меткам. Ключи счетчиков — кортежи значений
+    меток.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.requests = defaultdict(int)
+        self.buckets = defaultdict(
+            lambda: [0] * (len(settings.METRICS_BUCKETS) + 1)
+        )
+        self.seconds = defaultdict(float)
+        self.sampled = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.db_seconds = defaultdict(float)
+        self.template_seconds = defaultdict(float)
+        self.cache_hits = defaultdict(int)
+        self.cache_misses = defaultdict(int)
+
+    def observe(self, view, status, seconds, sample=None):
+        bucket = bisect_left(settings.METRICS_BUCKETS, seconds)
+        with self.lock:
+            self.requests[view, status] += 1
+            self.buckets[view][bucket] += 1
+            self.seconds[view] += seconds
+            if sample is None:
+                return
+            self.sampled[view, ] += 1
+            self.queries[view, ] += sample.queries
+            self.db_seconds[view, ] += sample.db_time
+            self.template_seconds[view, ] += sample.template_time
+            for kind, (hits, misses) in sample.cache.items():
+                self.cache_hits[view, kind] += hits
+                self.cache_misses[view, kind] += misses
+
+    def render(self):
+        """Счетчики в текстовом формате Prometheus."""
+        by_view, by_kind = ('view', ), ('view', 'kind')
+        with self.lock:
+            lines = _counter(
+                'requests_total', 'Запросы по view и статусу ответа',
+                ('view', 'status'), self.requests,
+            )
+            lines += self._histogram()
+            lines += _counter(
+                'sampled_requests_total', 'Запросы с подробными замерами',
+                by_view, self.sampled,
+            )
+            lines += _counter(
+                'db_queries_total', 'Запросы к базе',
+                by_view, self.queries,
+            )
+            lines += _counter(
+                'db_seconds_total', 'Время запросов к базе',
+                by_view, self.db_seconds,
+            )
+            lines += _counter(
+                'template_seconds_total', 'Время рендеринга шаблонов',
+                by_view, self.template_seconds,
+            )
+            lines += _counter(
+                'cache_hits_total', 'Попадания в кеш',
+                by_kind, self.cache_hits,
+            )
+            lines += _counter(
+                'cache_misses_total', 'Промахи кеша',
+                by_kind, self.cache_misses,
+            )
+        return '\n'.join(lines) + '\n'
+
+    def _histogram(self):
+        name = f'{settings.METRICS_PREFIX}_request_seconds'
+        lines = [
+            f'# HELP {name} Время ответа view',
+            f'# TYPE {name} histogram',
+        ]
+        bounds = [*map(str, settings.METRICS_BUCKETS), '+Inf']
+        for view in sorted(self.buckets):
+            total = 0
+            for bound, count in zip(bounds, self.buckets[view]):
+                total += count
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {total}'
+                )
+            lines.append(f'{name}_sum{{view="{view}"}} {self.seconds[view]}')
+            lines.append(f'{name}_count{{view="{view}"}} {total}')
+        return lines
+
+
+def _counter(name, help_text, labels, values):
+    name = f'{settings.METRICS_PREFIX}_{name}'
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key in sorted(values):
+        pairs = ','.join(
+            f'{label}="{value}"' for label, value in zip(labels, key)
+        )
+        lines.append(f'{name}{{{pairs}}} {values[key]}')
+    return lines
+
+
+def record(request, response, seconds, sample):
+    """Учитывает запрос в счетчиках и пишет его замеры в лог."""
+    match = request.resolver_match
+    view = match.view_name if match else UNRESOLVED
+    registry.observe(view, response.status_code, seconds, sample)
+    if sample is None:
+        return
+    entry = {
+        'view': view,
+        'method': request.method,
+        'status': response.status_code,
+        'ms': round(seconds * 1000, 2),
+        'queries': sample.queries,
+        'db_ms': round(sample.db_time * 1000, 2),
+        'template_ms': round(sample.template_time * 1000, 2),
+        'cache': {
+            kind: {'hits': hits, 'misses': misses}
+            for kind, (hits, misses) in sample.cache.items()
+        },
+    }
+    logger.info(json.dumps(entry), extra={'metrics': entry})
+
+
+registry = Registry()
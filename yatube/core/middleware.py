@@ -0,0 +1,42 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Замеряет время ответа каждого view.
+
+    С вероятностью METRICS_SAMPLE_RATE запрос сэмплируется: для него
+    считаются запросы к базе и их время, время шаблонов и обращения
+    к кешу. Остальные запросы стоят одного замера времени, поэтому
+    middleware можно держать включенным в продакшене.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = None
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            sample = metrics.Sample()
+        token = metrics.current.set(sample)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                if sample is not None:
+                    for connection in connections.all():
+                        stack.enter_context(
+                            connection.execute_wrapper(sample)
+                        )
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        metrics.record(
+            request, response, time.perf_counter() - started, sample
+        )
+        return response
@@ -1,4 +1,7 @@
+from contextlib import contextmanager
+
 from django.db import models
+from django.utils.timezone import now
 
 
 class CreatedModel(models.Model):
@@ -10,3 +13,76 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Сохраняет переданные pub_date при массовой загрузке данных."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class CountersMixin:
+    """Примесь для моделей со счетчиками.
+
+    Счетчики меняются только атомарными F-выражениями, поэтому при
+    сохранении существующей записи они не перезаписываются.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Task(models.Model):
+    """Запись очереди фоновых задач (outbox).
+
+    Пишется в той же транзакции, что и изменение, которое ее породило,
+    поэтому задача не теряется, даже если процесс упадет до ее
+    выполнения: такие записи дочитывает manage.py run_workers.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    args = models.TextField('Аргументы', default='[]')
+    state = models.CharField(
+        'Состояние', max_length=10, choices=STATES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    available_at = models.DateTimeField('Выполнить после', default=now)
+    locked_until = models.DateTimeField(
+        'Занята до', null=True, blank=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+        indexes = [
+            models.Index(fields=['state', 'available_at'],
+                         name='core_task_due_idx'),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args):
+    """Ставит вызов func(*args) в очередь после фиксации транзакции.
+
+    Запись outbox создается в текущей транзакции: если она откатится,
+    задачи не будет. Аргументы должны сериализоваться в JSON, а func —
+    быть функцией уровня модуля, чтобы run_workers мог ее импортировать.
+    """
+    task = Task.objects.create(name=task_name(func), args=json.dumps(args))
+    transaction.on_commit(lambda: get_backend().submit(task))
+    return task
+
+
+def claim(task):
+    """Занимает задачу; False, если ее уже взял другой исполнитель.
+
+    Условие на число попыток делает захват атомарным: из двух
+    исполнителей обновить запись успеет только один.
+    """
+    now = timezone.now()
+    claimed = Task.objects.filter(
+        Q(state=Task.PENDING, available_at__lte=now)
+        | Q(state=Task.RUNNING, locked_until__lt=now),
+        pk=task.pk,
+        attempts=task.attempts,
+    ).update(
+        state=Task.RUNNING,
+        attempts=task.attempts + 1,
+        locked_until=now + timedelta(seconds=settings.TASK_LEASE),
+    )
+    if claimed:
+        task.attempts += 1
+    return bool(claimed)
+
+
+def execute(task):
+    """Выполняет занятую задачу: при успехе удаляет запись, при ошибке
+    откладывает повтор или, после TASK_MAX_ATTEMPTS попыток, помечает
+    задачу невыполненной."""
+    try:
+        import_string(task.name)(*json.loads(task.args))
+    except Exception as error:
+        logger.exception('Задача %s не выполнена', task)
+        retry = task.attempts < settings.TASK_MAX_ATTEMPTS
+        delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+        Task.objects.filter(pk=task.pk).update(
+            state=Task.PENDING if retry else Task.FAILED,
+            available_at=timezone.now() + timedelta(seconds=delay),
+            locked_until=None,
+            last_error=f'{type(error).__name__}: {error}',
+        )
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def run(task):
+    if claim(task):
+        execute(task)
+
+
+def due_tasks(limit):
+    now = timezone.now()
+    return list(
+        Task.objects.filter(
+            Q(state=Task.PENDING, available_at__lte=now)
+            | Q(state=Task.RUNNING, locked_until__lt=now)
+        ).order_by('available_at', 'pk')[:limit]
+    )
+
+
+def drain(limit):
+    """Выполняет до limit задач, срок которых подошел; возвращает их число.
+
+    Задачи, занятые исполнителем, который не уложился в TASK_LEASE
+    (например, упал), выполняются повторно.
+    """
+    done = 0
+    for task in due_tasks(limit):
+        if claim(task):
+            execute(task)
+            done += 1
+    return done
+
+
+class InlineBackend:
+    """Выполняет задачу сразу после фиксации, в потоке запроса."""
+
+    def submit(self, task):
+        run(task)
+
+
+class OutboxBackend:
+    """Только сохраняет задачи: их выполняет manage.py run_workers."""
+
+    def submit(self, task):
+        pass
+
+
+class ThreadPoolBackend:
+    """Выполняет задачи в пуле из TASK_WORKERS потоков процесса.
+
+    Если процесс остановится раньше, записи outbox останутся, и их
+    выполнит run_workers.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.TASK_WORKERS,
+                    thread_name_prefix='tasks',
+                )
+        return self.executor
+
+    def submit(self, task):
+        try:
+            self.get_executor().submit(self.run_in_worker, task)
+        except RuntimeError:
+            logger.warning('Пул задач остановлен, задачу %s выполнит '
+                           'run_workers', task)
+
+    @staticmethod
+    def run_in_worker(task):
+        # У потока пула свое соединение с базой: закрываем его после задачи.
+        try:
+            run(task)
+        except Exception:
+            logger.exception('Задача %s не выполнена', task)
+        finally:
+            close_old_connections()
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.TASKS_BACKEND)()
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    if setting == 'TASKS_BACKEND':
+        get_backend.cache_clear()
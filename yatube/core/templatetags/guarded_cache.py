@@ -0,0 +1,43 @@
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Library, TemplateSyntaxError, VariableDoesNotExist
+from django.templatetags.cache import CacheNode, do_cache
+
+from core.cache import get_or_build
+
+register = Library()
+
+
+class GuardedCacheNode(CacheNode):
+    """{% cache %} с защитой от одновременной пересборки фрагмента."""
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time_var.resolve(context))
+        except (VariableDoesNotExist, ValueError, TypeError):
+            raise TemplateSyntaxError(
+                f'"cache" tag got a bad timeout: {self.expire_time_var}'
+            )
+        cache_name = (
+            self.cache_name.resolve(context) if self.cache_name else 'default'
+        )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_build(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self.nodelist.render(context),
+            expire_time,
+            cache=caches[cache_name],
+        )
+
+
+@register.tag('cache')
+def do_guarded_cache(parser, token):
+    """Тот же синтаксис, что у {% cache %} из django.templatetags.cache."""
+    node = do_cache(parser, token)
+    return GuardedCacheNode(
+        node.nodelist,
+        node.expire_time_var,
+        node.fragment_name,
+        node.vary_on,
+        node.cache_name,
+    )
@@ -1,4 +1,27 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.tests.utils import OnCommitMixin
+
+from . import tasks
+from .cache import acquire, get_or_build, release
+from .metrics import registry
+from .models import Task
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +29,243 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(CACHE_LOCK_WAIT=0.2, CACHE_EARLY_REFRESH_BETA=1.0)
+class GuardedCacheTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        # Два экземпляра бэкенда над одним каталогом — как два воркера.
+        self.worker = FileBasedCache(self.location, {})
+        self.other_worker = FileBasedCache(self.location, {})
+        self.builds = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def build(self):
+        self.builds += 1
+        return f'фрагмент {self.builds}'
+
+    def test_workers_share_built_value(self):
+        """Значение, собранное одним воркером, видно другому."""
+        get_or_build('page', self.build, 60, cache=self.worker)
+        value = get_or_build('page', self.build, 60, cache=self.other_worker)
+        self.assertEqual(value, 'фрагмент 1')
+        self.assertEqual(self.builds, 1)
+
+    def test_locked_rebuild_serves_stale_value(self):
+        """Пока другой воркер пересобирает запись, отдается старая копия."""
+        self.worker.set('page', ('старый', 1.0, time.time() - 1), 60)
+        acquire('page:lock', 10, cache=self.other_worker)
+        value = get_or_build('page', self.build, 60, cache=self.worker)
+        self.assertEqual(value, 'старый')
+        self.assertEqual(self.builds, 0)
+
+    def test_expired_entry_is_rebuilt_once(self):
+        """Истекшую запись пересобирает воркер, взявший блокировку."""
+        self.worker.set('page', ('старый', 1.0, time.time() - 1), 60)
+        value = get_or_build('page', self.build, 60, cache=self.worker)
+        self.assertEqual(value, 'фрагмент 1')
+        self.assertIsNotNone(acquire('page:lock', 10, cache=self.worker))
+        value = get_or_build('page', self.build, 60, cache=self.other_worker)
+        self.assertEqual(value, 'фрагмент 1')
+
+    def test_missing_entry_waits_then_builds(self):
+        """Без записи воркер ждет не дольше лимита, чужой замок цел."""
+        token = acquire('page:lock', 10, cache=self.other_worker)
+        value = get_or_build('page', self.build, 60, cache=self.worker)
+        self.assertEqual(value, 'фрагмент 1')
+        self.assertIsNone(acquire('page:lock', 10, cache=self.worker))
+        release('page:lock', token, cache=self.other_worker)
+        self.assertIsNotNone(acquire('page:lock', 10, cache=self.worker))
+
+    def test_file_lock_taken_once(self):
+        """Из одновременных попыток блокировку получает одна."""
+        workers = [FileBasedCache(self.location, {}) for _ in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = list(pool.map(
+                lambda worker: acquire('page:lock', 10, cache=worker),
+                workers,
+            ))
+        self.assertEqual(len([token for token in tokens if token]), 1)
+
+    def test_release_keeps_foreign_lock(self):
+        """Истекшую блокировку забирает другой воркер, и старый владелец
+        ее не снимает."""
+        token = acquire('page:lock', 10, cache=self.worker)
+        path = f"{self.worker._key_to_file('page:lock')}.lock"
+        expired = time.time() - 60
+        os.utime(path, (expired, expired))
+        other = acquire('page:lock', 10, cache=self.other_worker)
+        self.assertIsNotNone(other)
+        release('page:lock', token, cache=self.worker)
+        self.assertIsNone(acquire('page:lock', 10, cache=self.worker))
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0)
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_sampled_request_is_measured(self):
+        """Для сэмплированного запроса видны база, шаблоны и кеш."""
+        self.client.get(reverse('posts:index'))
+        text = self.metrics()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 1', text
+        )
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"} 1', text
+        )
+        self.assertIn(
+            'yatube_request_seconds_bucket{view="posts:index",le="+Inf"} 1',
+            text,
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"} 1', text)
+        self.assertIn(
+            'yatube_cache_misses_total{view="posts:index",kind="fragment"}',
+            text,
+        )
+        seconds = [
+            line for line in text.splitlines()
+            if line.startswith('yatube_template_seconds_total')
+        ]
+        self.assertEqual(len(seconds), 1)
+        self.assertGreater(float(seconds[0].split()[-1]), 0)
+
+    def test_cache_hits_counted(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        self.assertIn(
+            'yatube_cache_hits_total{view="posts:index",kind="fragment"} 1',
+            self.metrics(),
+        )
+
+    def test_sampled_request_logged(self):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'posts:index')
+        self.assertEqual(entry['status'], 200)
+        self.assertEqual(entry['queries'], 1)
+        self.assertEqual(logs.records[0].metrics, entry)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_request_only_timed(self):
+        self.client.get(reverse('posts:index'))
+        text = self.metrics()
+        self.assertIn(
+            'yatube_request_seconds_count{view="posts:index"} 1', text
+        )
+        self.assertNotIn('yatube_db_queries_total{view="posts:index"}', text)
+
+    def test_unresolved_path_has_one_label(self):
+        self.client.get('/nonexist-page/')
+        self.client.get('/other-page/')
+        self.assertIn(
+            'yatube_requests_total{view="unresolved",status="404"} 2',
+            self.metrics(),
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_endpoint_closed_for_other_addresses(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+
+CALLS = []
+
+
+def record_call(*args):
+    CALLS.append(args)
+
+
+def failing_task():
+    raise ValueError('сбой')
+
+
+@override_settings(TASKS_BACKEND='core.tasks.InlineBackend',
+                   TASK_RETRY_DELAY=0, TASK_MAX_ATTEMPTS=2)
+class TaskQueueTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_task_runs_after_commit(self):
+        """Задача выполняется после фиксации, запись outbox удаляется."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            tasks.enqueue(record_call, 1, 'два')
+            self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(CALLS, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(CALLS, [(1, 'два')])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_then_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = tasks.enqueue(failing_task)
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(task.last_error, 'ValueError: сбой')
+        self.assertEqual(tasks.drain(10), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.FAILED)
+        self.assertEqual(tasks.drain(10), 0)
+
+    def test_task_claimed_once(self):
+        """Одну задачу не могут взять два исполнителя."""
+        with self.captureOnCommitCallbacks():
+            task = tasks.enqueue(record_call)
+        other = Task.objects.get(pk=task.pk)
+        self.assertTrue(tasks.claim(task))
+        self.assertFalse(tasks.claim(other))
+        self.assertEqual(tasks.drain(10), 0)
+
+    def test_expired_lease_is_taken_over(self):
+        """Задачу упавшего исполнителя выполняет run_workers."""
+        with self.captureOnCommitCallbacks():
+            task = tasks.enqueue(record_call, 'снова')
+        tasks.claim(task)
+        Task.objects.filter(pk=task.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        call_command('run_workers', once=True, stdout=StringIO())
+        self.assertEqual(CALLS, [('снова',)])
+        self.assertFalse(Task.objects.exists())
+
+    def test_backend_follows_setting(self):
+        """Смена TASKS_BACKEND сбрасывает закешированный исполнитель."""
+        self.assertIsInstance(tasks.get_backend(), tasks.InlineBackend)
+        with self.settings(TASKS_BACKEND='core.tasks.ThreadPoolBackend'):
+            self.assertIsInstance(
+                tasks.get_backend(), tasks.ThreadPoolBackend
+            )
+        self.assertIsInstance(tasks.get_backend(), tasks.InlineBackend)
+
+    @override_settings(TASKS_BACKEND='core.tasks.OutboxBackend')
+    def test_outbox_backend_leaves_task_to_workers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue(record_call, 3)
+        self.assertEqual(CALLS, [])
+        call_command('run_workers', once=True, stdout=StringIO())
+        self.assertEqual(CALLS, [(3,)])
+
+    def test_rolled_back_task_is_dropped(self):
+        """Задача из откатившейся транзакции не выполняется."""
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    tasks.enqueue(record_call, 4)
+                    raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(CALLS, [])
+        self.assertFalse(Task.objects.exists())
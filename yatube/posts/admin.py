@@ -1,9 +1,32 @@
 from django.contrib import admin
+from django.db.models import Max, Min
 
-from .models import Comment, Follow, Group, Post
+from core.admin import (EstimatedCountPaginator, PrefixSearchMixin,
+                        SharedChoicesAdmin)
 
+from . import search
+from .models import Comment, Follow, Group, Post, PostDay
 
-class PostAdmin(admin.ModelAdmin):
+
+class DayBuckets:
+    """Замена cl.queryset для date_hierarchy: годы, месяцы и дни
+    берутся из таблицы PostDay, а не группировкой постов."""
+
+    def __init__(self, year=None, month=None):
+        self.days = PostDay.objects.filter(posts_count__gt=0)
+        if year:
+            self.days = self.days.filter(day__year=year)
+        if month:
+            self.days = self.days.filter(day__month=month)
+
+    def aggregate(self, **kwargs):
+        return self.days.aggregate(first=Min('day'), last=Max('day'))
+
+    def dates(self, field_name, kind):
+        return self.days.dates('day', kind)
+
+
+class PostAdmin(SharedChoicesAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,12 +35,45 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу постов, а не LIKE по всей таблице.
+        if not search_term.strip():
+            return queryset, False
+        return search.get_backend().filter(queryset, search_term), False
+
+
+class GroupAdmin(PrefixSearchMixin, admin.ModelAdmin):
+    list_display = ('title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    prefix_search_fields = ('slug', 'title')
+
+
+class CommentAdmin(SharedChoicesAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'post')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('post', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class FollowAdmin(SharedChoicesAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from . import cache
+from .feed import FeedPaginator
+from .models import Group, Post, User
+from .utils import KeysetPaginator, get_comments_page
+
+
+def post_data(post):
+    # Без числа комментариев: комментарий меняет только версию поста,
+    # и в закешированных лентах счетчик бы устаревал.
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'thumbnail': post.thumbnail_url or None,
+        'url': reverse('posts:post_detail', args=[post.pk]),
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+        'author': comment.author.username,
+    }
+
+
+def _link(request, cursor):
+    return f'{request.path}?cursor={cursor}' if cursor else None
+
+
+def page_response(request, queryset):
+    return paginator_response(
+        request, KeysetPaginator(queryset, settings.POSTS_PER_PAGE)
+    )
+
+
+def paginator_response(request, paginator):
+    page = paginator.get_cursor_page(request.GET.get('cursor'))
+    return JsonResponse(
+        {
+            'results': [post_data(post) for post in page],
+            'next': _link(request, page.next_cursor()),
+            'previous': _link(request, page.previous_cursor()),
+        },
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@cache.conditional(cache.scopes_for_index)
+def index(request):
+    return page_response(request, Post.objects.for_feed())
+
+
+@cache.conditional(cache.scopes_for_group)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return page_response(request, Post.objects.for_feed().filter(group=group))
+
+
+@cache.conditional(cache.scopes_for_profile)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return page_response(
+        request, Post.objects.for_feed().filter(author=author)
+    )
+
+
+@cache.conditional(cache.scopes_for_post)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    return JsonResponse(
+        dict(post_data(post), comments_count=post.comments_count),
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@cache.conditional(cache.scopes_for_post)
+def post_comments(request, post_id):
+    page = get_comments_page(post_id, request.GET.get('cursor'))
+    if not page and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return JsonResponse(
+        {
+            'results': [comment_data(comment) for comment in page],
+            'next': _link(request, page.next_cursor()),
+            'previous': _link(request, page.previous_cursor()),
+        },
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@cache.conditional(cache.scopes_for_follow, per_user=True)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Нужна авторизация'}, status=403
+        )
+    return paginator_response(
+        request, FeedPaginator(request.user, settings.POSTS_PER_PAGE)
+    )
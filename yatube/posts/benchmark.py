@@ -0,0 +1,225 @@
+import platform
+import statistics
+import sys
+import time
+from importlib import import_module
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.db import connection
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .models import Comment, Follow, Group, Post, User
+from .urls import app_name, urlpatterns
+
+# Адрес клиента вне INTERNAL_IPS: debug_toolbar не должен попадать
+# в замеры.
+REMOTE_ADDR = '192.0.2.1'
+# Страницы, которые без входа отвечают редиректом на логин.
+LOGIN_REQUIRED = {
+    'post_create', 'post_edit', 'add_comment', 'follow_index',
+    'profile_follow', 'profile_unfollow', 'api_follow_index',
+}
+
+
+class Case:
+    """Один адрес из posts/urls.py с параметрами запроса."""
+
+    def __init__(self, name, path, query='', user=False):
+        self.name = name
+        self.path = path
+        self.query = query
+        self.user = user
+
+
+class Fixtures:
+    """Объекты базы, на которых замеряются страницы.
+
+    Берутся самые тяжелые: группа и автор с наибольшим числом постов,
+    пост с наибольшим числом комментариев, читатель с наибольшим числом
+    подписок.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.group = Group.objects.order_by('-posts_count', 'pk').first()
+        self.author = User.objects.order_by(
+            '-stats__posts_count', 'pk'
+        ).first()
+        self.post = Post.objects.order_by('-comments_count', 'pk').first()
+        self.reader = (
+            User.objects.annotate(follows=Count('follower'))
+            .order_by('-follows', 'pk').first()
+        )
+        # Отписка и подписка идут парой: если автор из подписок читателя,
+        # после замера подписка остается как была.
+        self.followee = (
+            User.objects.filter(following__user=self.reader)
+            .order_by('pk').first()
+        ) or self.author
+        self.own_post = (
+            Post.objects.filter(author=self.reader).order_by('pk').first()
+        )
+
+    def kwargs(self, name):
+        post = self.own_post if name == 'post_edit' else self.post
+        return {
+            'slug': self.group and self.group.slug,
+            'username': (
+                self.followee.username
+                if name in ('profile_follow', 'profile_unfollow')
+                else self.author.username
+            ),
+            'post_id': post and post.pk,
+        }
+
+
+def build_cases(fixtures):
+    """Варианты запросов для всех адресов posts/urls.py.
+
+    Адрес, параметры которого не из чего заполнить, вызывает ошибку:
+    новый маршрут не выпадет из замеров молча.
+    """
+    cases = []
+    for pattern in urlpatterns:
+        name = pattern.name
+        params = pattern.pattern.converters
+        kwargs = {key: fixtures.kwargs(name)[key] for key in params}
+        if None in kwargs.values():
+            raise ValueError(f'Нет данных для адреса {name}: {kwargs}')
+        cases.append(Case(
+            name=f'{app_name}:{name}',
+            path=reverse(f'{app_name}:{name}', kwargs=kwargs),
+            query=urlencode({'q': fixtures.query}) if name == 'search' else '',
+            user=name in LOGIN_REQUIRED,
+        ))
+    # Профили меняют подписку: отписка идет первой, подписка ее отменяет.
+    cases.sort(key=lambda case: case.name.endswith(':profile_follow'))
+    return cases
+
+
+def login_cookie(user):
+    """Cookie сессии вошедшего пользователя, без запроса к странице входа."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def environ(case, cookie):
+    host = next(
+        (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+        'localhost',
+    )
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': case.path,
+        'QUERY_STRING': case.query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': REMOTE_ADDR,
+        'HTTP_HOST': host,
+        'HTTP_COOKIE': cookie if case.user else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+def call(application, env):
+    """Один запрос к WSGI-приложению; возвращает код ответа."""
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    response = application(env, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return statuses[0]
+
+
+def percentile(timings, share):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def measure(application, case, cookie, requests, warmup):
+    for _ in range(warmup):
+        call(application, environ(case, cookie))
+    timings, statuses = [], {}
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        status = call(application, environ(case, cookie))
+        timings.append((time.perf_counter() - request_started) * 1000)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    elapsed = time.perf_counter() - started
+    return {
+        'path': case.path + (f'?{case.query}' if case.query else ''),
+        'user': case.user,
+        'requests': requests,
+        'statuses': statuses,
+        'errors': sum(
+            count for status, count in statuses.items() if int(status) >= 500
+        ),
+        'rps': round(requests / elapsed, 2),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def environment():
+    """Описание прогона: с чем сравнивать результаты."""
+    return {
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'cache': settings.CACHES['default']['BACKEND'],
+        'data': {
+            'users': User.objects.count(),
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    """Страницы, у которых p50 или p99 выросли больше чем в 1 + threshold.
+
+    Возвращает список (страница, метрика, было, стало).
+    """
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(
+                    (name, metric, previous[metric], current[metric])
+                )
+    return regressions
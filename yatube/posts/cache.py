@@ -0,0 +1,332 @@
+import hashlib
+import secrets
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control)
+from django.utils.http import http_date, quote_etag
+
+from core import metrics
+
+from .models import (Comment, FeedItem, Follow, Group, Post, Suggestion,
+                     User)
+
+INDEX = 'index'
+PULL_FEEDS = 'pull-feeds'
+TRENDING = 'trending'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def feed_scope(user_id):
+    return f'feed:{user_id}'
+
+
+def following_scope(user_id):
+    return f'following:{user_id}'
+
+
+def suggestions_scope(user_id):
+    return f'suggestions:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post, group_ids, readers):
+    """Области, в фрагментах которых показывается пост."""
+    scopes = [INDEX, profile_scope(post.author_id)]
+    scopes += [
+        group_scope(group_id)
+        for group_id in group_ids if group_id is not None
+    ]
+    for user_id in readers:
+        scopes.append(PULL_FEEDS if user_id is None else feed_scope(user_id))
+    return scopes
+
+
+def follow_scopes(follow):
+    """Области, которые меняет подписка: лента и подписки читателя,
+    счетчики на страницах обоих профилей."""
+    return [
+        feed_scope(follow.user_id),
+        following_scope(follow.user_id),
+        profile_scope(follow.user_id),
+        profile_scope(follow.author_id),
+    ]
+
+
+def _ids(queryset, field):
+    return queryset.order_by().values_list(field, flat=True).distinct()
+
+
+def author_scopes(user_id):
+    """Области, в фрагментах которых выводятся имя и ссылка пользователя:
+    ленты с его постами, страницы постов с его постами и комментариями,
+    ленты его подписчиков и чужие подсказки."""
+    posts = Post.objects.filter(author_id=user_id)
+    scopes = [INDEX, TRENDING, PULL_FEEDS, profile_scope(user_id)]
+    scopes += [
+        group_scope(pk)
+        for pk in _ids(posts.exclude(group=None), 'group_id')
+    ]
+    scopes += [post_scope(pk) for pk in _ids(posts, 'pk')]
+    scopes += [
+        post_scope(pk)
+        for pk in _ids(Comment.objects.filter(author_id=user_id), 'post_id')
+    ]
+    scopes += [
+        feed_scope(pk)
+        for pk in _ids(Follow.objects.filter(author_id=user_id), 'user_id')
+    ]
+    scopes += [
+        suggestions_scope(pk)
+        for pk in _ids(
+            Suggestion.objects.filter(author_id=user_id), 'user_id'
+        )
+    ]
+    return scopes
+
+
+def group_scopes(group_id):
+    """Области, в фрагментах которых выводятся название и ссылка группы:
+    ленты, профили авторов и страницы ее постов, ленты их читателей."""
+    posts = Post.objects.filter(group_id=group_id)
+    scopes = [INDEX, TRENDING, PULL_FEEDS, group_scope(group_id)]
+    scopes += [profile_scope(pk) for pk in _ids(posts, 'author_id')]
+    scopes += [post_scope(pk) for pk in _ids(posts, 'pk')]
+    scopes += [
+        feed_scope(pk)
+        for pk in _ids(
+            FeedItem.objects.filter(
+                post__group_id=group_id, user__isnull=False
+            ),
+            'user_id',
+        )
+    ]
+    return scopes
+
+
+def bump_author(user_id):
+    """Фоновая задача: устаревают фрагменты с именем пользователя."""
+    bump(*author_scopes(user_id))
+
+
+def bump_group(group_id):
+    """Фоновая задача: устаревают фрагменты с названием группы."""
+    bump(*group_scopes(group_id))
+
+
+def _key(scope):
+    return f'version:{scope}'
+
+
+def _new_version():
+    # Случайное значение, а не счетчик: после вытеснения ключа из кеша
+    # версия не начнется заново и не совпадет со старыми фрагментами.
+    # Перед ним записано время изменения для заголовка Last-Modified.
+    return f'{int(time.time())}-{secrets.token_hex(6)}'
+
+
+def _modified(version):
+    stamp, _, token = str(version).partition('-')
+    return int(stamp) if token and stamp.isdigit() else None
+
+
+def get_state(*scopes):
+    """Версии областей одной строкой и время их последнего изменения.
+
+    Время — unix timestamp или None, если его нет в сохраненной версии.
+    """
+    keys = [_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        metrics.cache_result('version', key in versions)
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    stamps = [_modified(versions[key]) for key in keys]
+    modified = None if None in stamps or not stamps else max(stamps)
+    return '.'.join(str(versions[key]) for key in keys), modified
+
+
+def get_versions(*scopes):
+    """Текущие версии областей в виде одной строки для ключа кеша."""
+    return get_state(*scopes)[0]
+
+
+def bump(*scopes):
+    """Меняет версии областей, делая их фрагменты устаревшими."""
+    if scopes:
+        cache.set_many(
+            {_key(scope): _new_version() for scope in set(scopes)},
+            timeout=None,
+        )
+
+
+def fragment_context(*scopes):
+    return {
+        'cache_version': get_versions(*scopes),
+        'cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+    }
+
+
+def _validators(request, scopes, per_user):
+    version, modified = get_state(*scopes)
+    key = f'{version}|{request.get_full_path()}'
+    if per_user:
+        csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+        key += f'|{request.user.pk}|{csrf}'
+    return quote_etag(hashlib.md5(key.encode()).hexdigest()), modified
+
+
+def _mark_fresh(request, response, etag, modified, per_user):
+    response.setdefault('ETag', etag)
+    if modified is not None:
+        response.setdefault('Last-Modified', http_date(modified))
+    if not per_user:
+        return
+    if request.user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+
+def conditional(get_scopes, per_user=False):
+    """Условный GET по версиям областей кеша.
+
+    get_scopes(request, *args, **kwargs) возвращает области, от которых
+    зависит ответ, или None, если проверку надо пропустить. ETag строится
+    из версий и адреса запроса, поэтому 304 отдается без вызова view и
+    без запросов к постам.
+
+    per_user — для страниц, которые выглядят по-разному для разных
+    пользователей: в ETag добавляются пользователь и CSRF-cookie, а ответ
+    помечается как требующий проверки и, для вошедших, как private.
+    Заголовок Vary: Cookie выставляет SessionMiddleware.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            etag, modified = _validators(request, scopes, per_user)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                _mark_fresh(request, response, etag, modified, per_user)
+            return response
+        return wrapper
+    return decorator
+
+
+def _lookup_pk(key, queryset):
+    # Соответствия slug и username объектам почти не меняются: храним их
+    # в кеше, чтобы ответ 304 обходился без запросов к базе.
+    pk = cache.get(key)
+    metrics.cache_result('lookup', pk is not None)
+    if pk is None:
+        pk = queryset.values_list('pk', flat=True).first()
+        if pk is not None:
+            cache.set(key, pk, settings.FRAGMENT_CACHE_TIMEOUT)
+    return pk
+
+
+def _group_key(slug):
+    return f'pk:group:{slug}'
+
+
+def _user_key(username):
+    digest = hashlib.md5(username.encode()).hexdigest()
+    return f'pk:user:{digest}'
+
+
+def _post_author_key(post_id):
+    return f'author:post:{post_id}'
+
+
+def forget_group(slug):
+    cache.delete(_group_key(slug))
+
+
+def forget_user(username):
+    cache.delete(_user_key(username))
+
+
+def forget_post_author(post_id):
+    cache.delete(_post_author_key(post_id))
+
+
+def scopes_for_index(request):
+    return [INDEX]
+
+
+def scopes_for_trending(request):
+    # Правка поста меняет INDEX, пересчет рейтинга — TRENDING.
+    return [INDEX, TRENDING]
+
+
+def scopes_for_group(request, slug):
+    pk = _lookup_pk(_group_key(slug), Group.objects.filter(slug=slug))
+    return None if pk is None else [group_scope(pk)]
+
+
+def scopes_for_profile(request, username):
+    pk = _lookup_pk(
+        _user_key(username), User.objects.filter(username=username)
+    )
+    return None if pk is None else [profile_scope(pk)]
+
+
+def scopes_for_post(request, post_id):
+    return [post_scope(post_id)]
+
+
+def scopes_for_post_page(request, post_id):
+    """Пост и его автор: на странице выводится число постов автора."""
+    author_id = cache.get(_post_author_key(post_id))
+    if author_id is None:
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True
+        ).first()
+        if author_id is None:
+            return None
+        # Смена автора сбрасывает ключ, а удаление поста меняет его версию.
+        cache.set(
+            _post_author_key(post_id), author_id,
+            settings.FRAGMENT_CACHE_TIMEOUT,
+        )
+    return [post_scope(post_id), profile_scope(author_id)]
+
+
+def scopes_for_profile_page(request, username):
+    """Автор и, для вошедших, подписки и подсказки читателя: от них
+    зависят кнопка подписки и список «Кого почитать».
+    """
+    scopes = scopes_for_profile(request, username)
+    if scopes is not None and request.user.is_authenticated:
+        scopes.append(following_scope(request.user.pk))
+        scopes.append(suggestions_scope(request.user.pk))
+    return scopes
+
+
+def scopes_for_follow(request):
+    if not request.user.is_authenticated:
+        return None
+    return [feed_scope(request.user.pk), PULL_FEEDS]
@@ -0,0 +1,143 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, PostDay, User, UserStats
+
+
+def _shift(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def user_stats_changed(user_id, field, delta):
+    updated = _shift(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        _shift(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def group_posts_changed(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def post_comments_changed(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def post_days_changed(pub_date, delta):
+    _shift_day(timezone.localdate(pub_date), delta)
+
+
+def _shift_day(day, delta):
+    updated = _shift(PostDay.objects.filter(day=day), 'posts_count', delta)
+    if not updated and delta > 0:
+        PostDay.objects.get_or_create(day=day)
+        _shift(PostDay.objects.filter(day=day), 'posts_count', delta)
+
+
+def follows_changed(user_id, author_id, delta):
+    user_stats_changed(user_id, 'following_count', delta)
+    user_stats_changed(author_id, 'followers_count', delta)
+
+
+def _stat(user, field):
+    try:
+        return getattr(user.stats, field)
+    except UserStats.DoesNotExist:
+        return 0
+
+
+def posts_count(user):
+    """Число постов пользователя без запроса COUNT."""
+    return _stat(user, 'posts_count')
+
+
+def followers_count(user):
+    return _stat(user, 'followers_count')
+
+
+def following_count(user):
+    return _stat(user, 'following_count')
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def rebuild():
+    """Пересчитывает все счетчики по данным таблиц."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post.objects.all(), 'group'))
+    Post.objects.update(comments_count=_count(Comment.objects.all(), 'post'))
+    PostDay.objects.all().delete()
+    PostDay.objects.bulk_create(
+        [
+            PostDay(day=row['day'], posts_count=row['total'])
+            for row in Post.objects.annotate(day=TruncDate('pub_date'))
+            .order_by().values('day').annotate(total=Count('pk'))
+        ],
+        batch_size=500,
+    )
+
+
+def _chunks(ids, size=500):
+    # SQLite ограничивает число параметров запроса.
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def refresh(user_ids, group_ids, posts):
+    """Пересчитывает счетчики пользователей user_ids, групп group_ids и
+    постов posts по данным таблиц и добавляет посты posts в PostDay.
+
+    Для загрузки в обход сигналов: в отличие от rebuild(), остальные
+    строки не трогаются.
+    """
+    for chunk in _chunks(user_ids):
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in chunk],
+            ignore_conflicts=True,
+        )
+        UserStats.objects.filter(user_id__in=chunk).update(
+            posts_count=_count(Post.objects.all(), 'author'),
+            followers_count=_count(Follow.objects.all(), 'author'),
+            following_count=_count(Follow.objects.all(), 'user'),
+        )
+    for chunk in _chunks(group_ids):
+        Group.objects.filter(pk__in=chunk).update(
+            posts_count=_count(Post.objects.all(), 'group')
+        )
+    posts.update(comments_count=_count(Comment.objects.all(), 'post'))
+    days = (
+        posts.annotate(day=TruncDate('pub_date'))
+        .order_by().values('day').annotate(total=Count('pk'))
+    )
+    for row in days:
+        _shift_day(row['day'], row['total'])
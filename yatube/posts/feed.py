@@ -0,0 +1,193 @@
+import heapq
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from . import cache
+from .models import FeedItem, Follow, Post
+from .utils import FORWARD, KeysetPaginator, seek
+
+
+def get_feed(user):
+    """Посты ленты подписок пользователя."""
+    followees = Follow.objects.filter(user=user).values('author')
+    inbox = FeedItem.objects.filter(
+        Q(user=user) | Q(user__isnull=True, author__in=followees)
+    )
+    return Post.objects.filter(pk__in=inbox.values('post'))
+
+
+class FeedPaginator(KeysetPaginator):
+    """Курсорные страницы ленты подписок.
+
+    Страница собирается по записям ленты: личные записи читателя и общие
+    записи каждого популярного автора листаются по индексам
+    (user, [author,] -pub_date, -post) с LIMIT, списки сливаются, и только
+    посты страницы подгружаются по id. Номерные страницы (?page=N) идут
+    по get_feed().
+    """
+
+    def __init__(self, user, per_page, **kwargs):
+        self.user = user
+        super().__init__(get_feed(user).for_feed(), per_page, **kwargs)
+
+    def _pulled_authors(self):
+        # Проверка на подписку — поиск по индексу (user, author, ...),
+        # а не просмотр всех общих записей.
+        shared = FeedItem.objects.filter(
+            user__isnull=True, author_id=OuterRef('author_id')
+        )
+        return (
+            Follow.objects.filter(user=self.user)
+            .annotate(pulled=Exists(shared))
+            .filter(pulled=True)
+            .values_list('author_id', flat=True)
+        )
+
+    def _fetch(self, cursor=None):
+        limit = self.per_page + 1
+        direction = cursor[2] if cursor else FORWARD
+        sources = [FeedItem.objects.filter(user=self.user)] + [
+            FeedItem.objects.filter(user__isnull=True, author_id=author_id)
+            for author_id in self._pulled_authors()
+        ]
+        items = []
+        for source in sources:
+            source = source.order_by('-pub_date', '-post_id')
+            if cursor:
+                source = seek(source, *cursor, key='post_id')
+            items.append(list(source.only('post', 'pub_date')[:limit]))
+        merged = heapq.merge(
+            *items,
+            key=lambda item: (item.pub_date, item.post_id),
+            reverse=direction == FORWARD,
+        )
+        post_ids = []
+        for item in merged:
+            if item.post_id not in post_ids:
+                post_ids.append(item.post_id)
+            if len(post_ids) == limit:
+                break
+        posts = Post.objects.for_feed().in_bulk(post_ids)
+        return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает id пользователей, чьи ленты изменились; None означает
+    общую запись, которая читается всеми подписчиками.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if not followers:
+        return []
+    if len(followers) > limit:
+        FeedItem.objects.create(
+            post=post, author_id=post.author_id, pub_date=post.pub_date
+        )
+        return [None]
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, post=post, author_id=post.author_id,
+                     pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    return followers
+
+
+def rehome(post):
+    """Переносит пост со сменившимся автором в ленты его подписчиков.
+
+    Записи подписчиков прежнего автора удаляются. Возвращает то же,
+    что fan_out().
+    """
+    FeedItem.objects.filter(post=post).delete()
+    return fan_out(post)
+
+
+def readers(post):
+    """id пользователей, в ленты которых попал пост."""
+    return list(
+        FeedItem.objects.filter(post=post).values_list('user_id', flat=True)
+    )
+
+
+def _insert(items):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id, limit=None):
+    """Добавляет в ленту нового подписчика уже вышедшие посты автора.
+
+    limit — сколько самых новых постов добавить. Возвращает True, если
+    добавлены не все посты.
+    """
+    pulled = FeedItem.objects.filter(
+        user__isnull=True, author_id=author_id
+    ).values('post')
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .exclude(pk__in=pulled)
+        .values_list('pk', 'pub_date')
+    )
+    rest = False
+    if limit is None:
+        posts = posts.iterator()
+    else:
+        posts = list(posts.order_by('-pub_date', '-pk')[:limit + 1])
+        rest = len(posts) > limit
+        posts = posts[:limit]
+    _insert(
+        FeedItem(user_id=user_id, post_id=post_id, author_id=author_id,
+                 pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+    return rest
+
+
+def backfill_rest(user_id, author_id):
+    """Фоновая задача: дополняет ленту подписчика старыми постами автора,
+    если подписка еще действует."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        backfill(user_id, author_id)
+        cache.bump(cache.feed_scope(user_id))
+
+
+def sync_author(author_id):
+    """Раскладывает по лентам посты автора, записанные в обход сигналов."""
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(followers) <= limit:
+        for user_id in followers:
+            backfill(user_id, author_id)
+        return
+    delivered = FeedItem.objects.filter(author_id=author_id).values('post')
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .exclude(pk__in=delivered)
+        .values_list('pk', 'pub_date')
+    )
+    _insert(
+        FeedItem(post_id=post_id, author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
@@ -0,0 +1,55 @@
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
+from . import cache
+from .models import Follow
+
+
+def _key(user_id):
+    version = cache.get_versions(cache.following_scope(user_id))
+    return f'followees:{user_id}:{version}'
+
+
+def followee_ids(user):
+    """id авторов, на которых подписан пользователь.
+
+    Множество хранится в общем кеше упакованным массивом чисел под
+    ключом с версией подписок читателя и запоминается на объекте
+    пользователя, поэтому в пределах запроса загружается один раз.
+    Подписка и отписка меняют версию, и старое значение больше
+    не читается.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    ids = getattr(user, '_followee_ids', None)
+    if ids is not None:
+        return ids
+    key = _key(user.pk)
+    packed = shared_cache.get(key)
+    if packed is None:
+        packed = array('q', sorted(
+            Follow.objects.filter(user_id=user.pk)
+            .values_list('author_id', flat=True)
+        )).tobytes()
+        shared_cache.set(key, packed, settings.FRAGMENT_CACHE_TIMEOUT)
+    ids = frozenset(array('q', packed))
+    user._followee_ids = ids
+    return ids
+
+
+def is_following(user, author_id):
+    return author_id in followee_ids(user)
+
+
+def forget(user):
+    """Сбрасывает множество, запомненное на объекте пользователя.
+
+    request.user — SimpleLazyObject: удаление атрибута передается
+    обернутому пользователю, а его __dict__ прокси не видит.
+    """
+    try:
+        del user._followee_ids
+    except AttributeError:
+        pass
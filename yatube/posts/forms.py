@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize_image, validate_image_upload
 from .models import Comment, Post
 
 
@@ -9,6 +11,13 @@ class PostForm(forms.ModelForm):
         fields = ('text', 'group', 'image')
         widgets = {'text': forms.Textarea(attrs={'cols': 40, 'rows': 10})}
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            validate_image_upload(image)
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
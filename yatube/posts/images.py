@@ -0,0 +1,90 @@
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Параметры сохранения нормализованной картинки по форматам.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {'optimize': True},
+    'WEBP': {'quality': 85, 'method': 4},
+}
+
+
+def validate_image_upload(upload):
+    """Проверяет размер файла, формат и разрешение загруженной картинки.
+
+    Читается только заголовок файла: пиксели не декодируются, поэтому
+    огромная или специально сжатая картинка отбрасывается до того, как
+    займет память и процессор.
+    """
+    if upload.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise forms.ValidationError(
+            'Файл больше %(limit)s',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.IMAGE_UPLOAD_MAX_BYTES)},
+        )
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise _too_many_pixels()
+    except Exception:
+        raise forms.ValidationError(
+            'Загрузите правильное изображение', code='invalid_image'
+        )
+    finally:
+        upload.seek(0)
+    if (
+        image_format not in settings.IMAGE_UPLOAD_FORMATS
+        or image_format not in Image.SAVE
+    ):
+        raise forms.ValidationError(
+            'Формат %(format)s не поддерживается, загрузите %(allowed)s',
+            code='invalid_format',
+            params={
+                'format': image_format,
+                'allowed': ', '.join(settings.IMAGE_UPLOAD_FORMATS),
+            },
+        )
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise _too_many_pixels()
+
+
+def _too_many_pixels():
+    return forms.ValidationError(
+        'Разрешение больше %(limit)s мегапикселей',
+        code='too_many_pixels',
+        params={'limit': settings.IMAGE_UPLOAD_MAX_PIXELS // 10 ** 6},
+    )
+
+
+def normalize_image(upload):
+    """Пересохраняет картинку в ее формате, уменьшив до IMAGE_MAX_SIZE.
+
+    Метаданные отбрасываются, поворот из EXIF применяется к пикселям.
+    У анимированных GIF остается первый кадр.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = image.format
+        # JPEG умеет декодироваться сразу в уменьшенном масштабе.
+        image.draft('RGB', settings.IMAGE_MAX_SIZE)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.IMAGE_MAX_SIZE)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(
+            buffer, format=image_format, **SAVE_OPTIONS.get(image_format, {})
+        )
+    return SimpleUploadedFile(
+        name=upload.name,
+        content=buffer.getvalue(),
+        content_type=Image.MIME.get(image_format, upload.content_type),
+    )
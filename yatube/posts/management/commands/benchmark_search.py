@@ -0,0 +1,74 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+
+from posts.management.commands.seed_posts import vocabulary
+from posts.models import Post
+from posts.search import DatabaseSearchBackend, get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время поиска через индекс и поиска подстрок. '
+        'Запросы по умолчанию берутся из словаря seed_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--page', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--words', type=int, default=5000)
+        parser.add_argument(
+            '--query', action='append', dest='queries',
+            help='Запрос для замера; можно указать несколько раз'
+        )
+        parser.add_argument(
+            '--skip-scan', action='store_true',
+            help='Не замерять поиск подстрок без индекса'
+        )
+
+    def default_queries(self, options):
+        words = vocabulary(random.Random(options['seed']), options['words'])
+        middle = len(words) // 10
+        return [
+            words[0],
+            words[middle],
+            words[-1],
+            f'{words[0]} {words[middle]}',
+            words[middle][:3],
+        ]
+
+    def measure(self, backend, query, page, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            paginator = Paginator(
+                backend.search(query), settings.POSTS_PER_PAGE
+            )
+            list(paginator.get_page(page))
+            timings.append((time.perf_counter() - started) * 1000)
+        return paginator.count, timings
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('Нет постов: запустите seed_posts')
+        backends = {type(get_backend()).__name__: get_backend()}
+        if not options['skip_scan']:
+            backends['DatabaseSearchBackend'] = DatabaseSearchBackend()
+        queries = options['queries'] or self.default_queries(options)
+        for query in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'«{query}»'))
+            for name, backend in backends.items():
+                for page in (1, options['page']):
+                    found, timings = self.measure(
+                        backend, query, page, options['repeat']
+                    )
+                    self.stdout.write(
+                        f'  {name}, страница {page}: найдено {found}, '
+                        f'медиана {statistics.median(timings):.2f} мс, '
+                        f'максимум {max(timings):.2f} мс'
+                    )
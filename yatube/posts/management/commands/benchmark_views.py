@@ -0,0 +1,94 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.management.commands.seed_posts import vocabulary
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность и задержки p50/p99 всех адресов '
+        'posts/urls.py через WSGI-приложение. Данные готовит seed_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--output', help='Файл, в который записать результаты в JSON'
+        )
+        parser.add_argument(
+            '--baseline', help='Результаты прошлого прогона для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p50 и p99 относительно baseline'
+        )
+        parser.add_argument(
+            '--only', action='append',
+            help='Замерить только адрес с этим именем, например posts:index'
+        )
+        parser.add_argument('--query', help='Запрос для страницы поиска')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--words', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('Нет постов: запустите seed_posts')
+        # Приложение из yatube/wsgi.py — то же, что обслуживает продакшен.
+        from yatube.wsgi import application
+
+        query = options['query'] or vocabulary(
+            random.Random(options['seed']), options['words']
+        )[options['words'] // 50]
+        fixtures = benchmark.Fixtures(query)
+        cookie = benchmark.login_cookie(fixtures.reader)
+        results = benchmark.environment()
+        results.update(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            results={},
+        )
+        for case in benchmark.build_cases(fixtures):
+            if options['only'] and case.name not in options['only']:
+                continue
+            result = benchmark.measure(
+                application, case, cookie,
+                options['requests'], options['warmup'],
+            )
+            results['results'][case.name] = result
+            self.report(case.name, result)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['threshold'])
+
+    def report(self, name, result):
+        style = self.style.ERROR if result['errors'] else str
+        self.stdout.write(style(
+            f'{name:<28} {result["rps"]:>9.1f} запр/с  '
+            f'p50 {result["p50_ms"]:>8.2f} мс  '
+            f'p99 {result["p99_ms"]:>8.2f} мс  '
+            f'коды {result["statuses"]}'
+        ))
+
+    def compare(self, results, path, threshold):
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        if baseline.get('data') != results['data']:
+            self.stdout.write(self.style.WARNING(
+                'Данные отличаются от прогона baseline: '
+                f'{baseline.get("data")} и {results["data"]}'
+            ))
+        regressions = benchmark.compare(results, baseline, threshold)
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(
+                f'{name}: {metric} {before:.2f} → {after:.2f} мс'
+            ))
+        if regressions:
+            raise CommandError(f'Страниц с регрессией: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
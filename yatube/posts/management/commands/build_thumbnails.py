@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит варианты картинок для постов, у которых их еще нет'
+
+    def handle(self, *args, **options):
+        post_ids = (
+            Post.objects.exclude(image='').filter(image_variants='')
+            .values_list('pk', flat=True)
+        )
+        built = 0
+        for post_id in post_ids.iterator():
+            thumbnails.generate(post_id)
+            built += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано постов: {built}'))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает подсказки «Кого почитать»: авторов, которых читают '
+        'подписки пользователя, и самых читаемых авторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--limit', type=int, default=settings.SUGGESTIONS_LIMIT
+        )
+
+    def report(self, total):
+        self.stdout.write(f'Сохранено подсказок: {total}')
+
+    def handle(self, *args, **options):
+        total = suggestions.compute_all(
+            options['batch_size'], options['limit'], self.report
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, подсказок: {total}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг «Популярное» по свежим комментариям '
+        'и подписчикам авторов. Запускается периодически, например cron.'
+    )
+
+    def handle(self, *args, **options):
+        total = trending.compute()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг пересчитан, постов: {total}'
+        ))
@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Comment, FeedItem, Follow, Group, Post, User
+from posts.utils import FORWARD, KeysetPaginator
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время запросов лент. Запустите до и после '
+        'миграции индексов, чтобы сравнить результаты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--depth', type=float, default=0.9,
+            help='Доля ленты, которую надо пролистать для глубокой страницы'
+        )
+        parser.add_argument('--no-plans', action='store_true')
+
+    def scenarios(self, depth):
+        per_page = settings.POSTS_PER_PAGE
+        if not 0 <= depth < 1:
+            raise CommandError('--depth должна быть в диапазоне [0, 1)')
+        # Номер строки считается от числа постов, а не от последнего id:
+        # после удалений и import_posts id идут с пропусками.
+        total = Post.objects.count()
+        if not total:
+            raise CommandError('Нет постов: запустите seed_posts')
+        offset = int(total * depth)
+        anchor = Post.objects.order_by('-pub_date', '-pk')[offset]
+        group = Group.objects.order_by('-posts_count').first()
+        author = User.objects.order_by('-stats__posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        reader = User.objects.order_by('-stats__following_count').first()
+        feed = KeysetPaginator(Post.objects.for_feed(), per_page)
+        return {
+            'index: первая страница': feed.object_list[:per_page],
+            'index: глубокая страница, курсор': feed._seek(
+                anchor.pub_date, anchor.pk, FORWARD
+            )[:per_page],
+            'index: глубокая страница, OFFSET': feed.object_list[
+                offset:offset + per_page
+            ],
+            'group_list: первая страница': KeysetPaginator(
+                Post.objects.for_feed().filter(group=group), per_page
+            ).object_list[:per_page],
+            'profile: первая страница': KeysetPaginator(
+                Post.objects.for_feed().filter(author=author), per_page
+            ).object_list[:per_page],
+            'follow_index: записи ленты': FeedItem.objects.filter(
+                user=reader
+            ).order_by('-pub_date', '-post_id')[:per_page + 1],
+            'post_detail: комментарии': Comment.objects.filter(
+                post=post
+            ).order_by('-pub_date', '-pk')[:per_page],
+            'follow: подписчики автора': Follow.objects.filter(
+                author=author
+            ).values_list('user_id', flat=True)[:per_page],
+        }
+
+    def handle(self, *args, **options):
+        for name, queryset in self.scenarios(options['depth']).items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(
+                f'  медиана {statistics.median(timings):.2f} мс, '
+                f'максимум {max(timings):.2f} мс'
+            )
+            if not options['no_plans']:
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'  {line}')
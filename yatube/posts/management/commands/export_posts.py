@@ -0,0 +1,47 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки в NDJSON или CSV. '
+        'Файлы картинок не копируются: переносятся только их имена.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdout')
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--progress-every', type=int, default=100000)
+
+    def counted(self, records, every):
+        self.exported = 0
+        for record in records:
+            yield record
+            self.exported += 1
+            if self.exported % every == 0:
+                self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stderr.write(
+            f'Выгружено строк: {self.exported}, '
+            f'{self.exported / elapsed:.0f} строк/с'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or transfer.guess_format(path)
+        self.started = time.monotonic()
+        records = self.counted(
+            transfer.export_records(), options['progress_every']
+        )
+        if path == '-':
+            transfer.write_records(sys.stdout, records, file_format)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                transfer.write_records(stream, records, file_format)
+        self.report()
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии и подписки из NDJSON или CSV, '
+        'выгруженных командой export_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin')
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def report(self, importer):
+        self.stdout.write(
+            f'Загружено строк: {importer.total}, '
+            f'{importer.rate():.0f} строк/с'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or transfer.guess_format(path)
+        importer = transfer.Importer(options['batch_size'], self.report)
+        if path == '-':
+            importer.run(transfer.read_records(sys.stdin, file_format))
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                importer.run(transfer.read_records(stream, file_format))
+        counts = ', '.join(
+            f'{model._meta.verbose_name_plural}: {count}'
+            for model, count in importer.counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {importer.elapsed():.1f} с ({counts}), '
+            f'{importer.rate():.0f} строк/с'
+        ))
@@ -0,0 +1,251 @@
+import argparse
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from core.models import explicit_pub_date
+from posts import counters, feed, search, trending
+from posts.models import Comment, Follow, Group, Post, User
+
+
+SYLLABLES = (
+    'ка', 'ро', 'ми', 'на', 'то', 'ле', 'су', 'ви', 'да', 'по', 'ре', 'зо',
+    'ну', 'ша', 'ти', 'го',
+)
+# Момент, от которого отсчитываются даты постов и комментариев: с ним
+# повторный запуск с тем же seed дает те же данные, включая даты.
+SEED_NOW = '2024-01-01T00:00:00+00:00'
+
+
+def reference_date(value):
+    """Дата из --now в формате ISO 8601; без пояса — в текущем поясе."""
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise argparse.ArgumentTypeError(f'Неверная дата: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def vocabulary(rng, size):
+    """Словарь выдуманных слов; первые слова встречаются чаще всего."""
+    words = sorted({
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(size)
+    })
+    rng.shuffle(words)
+    return words
+
+
+def post_text(rng, number, words, cum_weights):
+    return f'Тестовый пост {number}: ' + ' '.join(
+        rng.choices(words, cum_weights=cum_weights, k=rng.randint(5, 40))
+    )
+
+
+def power_law_weights(size, exponent=1.0):
+    """Накопленные веса рангов 1..size, убывающие как 1 / rank ** exponent."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def sample_image(rng, number):
+    """Картинка-градиент 1200×800 в JPEG, одинаковая при том же rng."""
+    start, end = (
+        Image.new('RGB', (1200, 800), tuple(
+            rng.randrange(256) for _ in range(3)
+        ))
+        for _ in range(2)
+    )
+    mask = Image.linear_gradient('L').rotate(90).resize((1200, 800))
+    image = Image.composite(start, end, mask)
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return ContentFile(buffer.getvalue(), name=f'seed-{number}.jpg')
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу детерминированными тестовыми данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--max-follows', type=int, default=200,
+            help='Наибольшее число подписок одного пользователя'
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.05,
+            help='Доля постов с картинкой'
+        )
+        parser.add_argument(
+            '--image-files', type=int, default=8,
+            help='Сколько разных файлов картинок создать'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--words', type=int, default=5000)
+        parser.add_argument(
+            '--now', type=reference_date, default=SEED_NOW,
+            help='Дата, от которой отсчитываются даты данных (ISO 8601)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.options = options
+        self.now = options['now']
+        user_ids, group_ids = self.create_users_and_groups()
+        images = self.create_images(rng)
+        self.create_posts(rng, user_ids, group_ids, images)
+        self.create_comments(rng, user_ids)
+        authors = self.create_follows(rng, user_ids)
+        with transaction.atomic():
+            counters.rebuild()
+            search.get_backend().rebuild()
+        for author_id in authors:
+            with transaction.atomic():
+                feed.sync_author(author_id)
+        trending.compute(self.now)
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def create_users_and_groups(self):
+        password = make_password(None)
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [
+                    User(username=f'seed_user_{i}', password=password)
+                    for i in range(self.options['users'])
+                ],
+                ignore_conflicts=True,
+            )
+            Group.objects.bulk_create(
+                [
+                    Group(title=f'Группа {i}', slug=f'seed-group-{i}',
+                          description=f'Описание группы {i}')
+                    for i in range(self.options['groups'])
+                ],
+                ignore_conflicts=True,
+            )
+        user_ids = list(
+            User.objects.filter(username__startswith='seed_user_')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        group_ids = list(
+            Group.objects.filter(slug__startswith='seed-group-')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        return user_ids, group_ids
+
+    def create_images(self, rng):
+        """Общие для постов файлы картинок: посты ссылаются на них."""
+        if not self.options['image_share']:
+            return []
+        names = []
+        for number in range(self.options['image_files']):
+            image = sample_image(rng, number)
+            name = f'posts/seed/{image.name}'
+            if not default_storage.exists(name):
+                default_storage.save(name, image)
+            names.append(name)
+        return names
+
+    def create_posts(self, rng, user_ids, group_ids, images):
+        words = vocabulary(rng, self.options['words'])
+        # Частоты слов по закону Ципфа, как в живых текстах: поиск
+        # проверяется и на частых, и на редких словах.
+        weights = power_law_weights(len(words))
+        span = self.options['days'] * 24 * 60 * 60
+        total, created = self.options['posts'], 0
+        while created < total:
+            size = min(self.options['batch_size'], total - created)
+            with transaction.atomic(), explicit_pub_date(Post):
+                Post.objects.bulk_create([
+                    Post(
+                        text=post_text(rng, created + i, words, weights),
+                        author_id=rng.choice(user_ids),
+                        group_id=(
+                            rng.choice(group_ids)
+                            if group_ids and rng.random() < 0.7 else None
+                        ),
+                        pub_date=self.now - timedelta(
+                            seconds=rng.randrange(span)
+                        ),
+                        image=(
+                            rng.choice(images)
+                            if images
+                            and rng.random() < self.options['image_share']
+                            else ''
+                        ),
+                    )
+                    for i in range(size)
+                ])
+            created += size
+            self.stdout.write(f'Создано постов: {created}')
+
+    def create_comments(self, rng, user_ids):
+        """Комментарии к случайным постам; у немногих постов их много."""
+        posts = list(
+            Post.objects.filter(author_id__in=user_ids)
+            .order_by('pk').values_list('pk', 'pub_date')
+        )
+        if not posts:
+            return
+        rng.shuffle(posts)
+        weights = power_law_weights(len(posts))
+        total, created = self.options['comments'], 0
+        while created < total:
+            size = min(self.options['batch_size'], total - created)
+            comments = []
+            for number in range(created, created + size):
+                post_id, posted = rng.choices(posts, cum_weights=weights)[0]
+                comments.append(Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(user_ids),
+                    text=f'Тестовый комментарий {number}',
+                    pub_date=posted + (self.now - posted) * rng.random(),
+                ))
+            with transaction.atomic(), explicit_pub_date(Comment):
+                Comment.objects.bulk_create(comments)
+            created += size
+            self.stdout.write(f'Создано комментариев: {created}')
+
+    def create_follows(self, rng, user_ids):
+        """Граф подписок со степенным распределением степеней.
+
+        Число подписок пользователя берется из распределения Парето,
+        авторы выбираются по весам рангов: у немногих авторов
+        подписчиков очень много, у большинства — единицы.
+        """
+        authors = list(user_ids)
+        rng.shuffle(authors)
+        weights = power_law_weights(len(authors))
+        limit = min(self.options['max_follows'], len(authors) - 1)
+        follows = []
+        for user_id in user_ids:
+            degree = min(limit, int(rng.paretovariate(1.2)))
+            targets = set(rng.choices(authors, cum_weights=weights, k=degree))
+            follows += [
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in sorted(targets - {user_id})
+            ]
+        with transaction.atomic():
+            Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        self.stdout.write(f'Создано подписок: {len(follows)}')
+        return sorted({follow.author_id for follow in follows})
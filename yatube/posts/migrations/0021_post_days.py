@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:58
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_post_days(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostDay = apps.get_model('posts', 'PostDay')
+    PostDay.objects.bulk_create(
+        [
+            PostDay(day=row['day'], posts_count=row['total'])
+            for row in Post.objects.annotate(day=TruncDate('pub_date'))
+            .order_by().values('day').annotate(total=Count('pk'))
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_trending_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='День')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.RunPython(fill_post_days, migrations.RunPython.noop),
+    ]
@@ -1,21 +1,46 @@
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
 
-from core.models import CreatedModel
+from core.models import CountersMixin, CreatedModel
 
 User = get_user_model()
 
+# Формат, который понимает любой браузер: им заполняется <img srcset>.
+FALLBACK_MIME = 'image/jpeg'
+
 
-class Group(models.Model):
-    title = models.CharField(max_length=200)
+class Group(CountersMixin, models.Model):
+    title = models.CharField(max_length=200, db_index=True)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(CreatedModel):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа подгружаются тем же запросом."""
+        return self.select_related('author', 'group').defer(
+            'author__password',
+            'author__email',
+            'author__last_login',
+            'author__date_joined',
+            'group__description',
+        )
+
+
+class Post(CountersMixin, CreatedModel):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -24,7 +49,8 @@ class Post(CreatedModel):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -32,26 +58,99 @@ class Post(CreatedModel):
         on_delete=models.SET_NULL,
         blank=True, null=True,
         verbose_name='Группа',
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    thumbnail = models.CharField(
+        'Миниатюра',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('comments_count',)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='posts_post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='posts_post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='posts_post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def thumbnail_url(self):
+        return default_storage.url(self.thumbnail) if self.thumbnail else ''
+
+    @property
+    def variants(self):
+        """Манифест вариантов: MIME-тип -> список пар (ширина, файл)."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
+    @property
+    def image_sources(self):
+        """Варианты в современных форматах для тегов <source>."""
+        return [
+            {'type': mime, 'srcset': _srcset(files)}
+            for mime, files in self.variants.items()
+            if mime != FALLBACK_MIME
+        ]
+
+    @property
+    def image_srcset(self):
+        return _srcset(self.variants.get(FALLBACK_MIME, ()))
+
+
+def _srcset(files):
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w' for width, name in files
+    )
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, поддерживаемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -62,6 +161,10 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['post', '-pub_date', '-id'],
+                         name='posts_comment_post_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -72,11 +175,13 @@ class Follow(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='follower',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='following',
+        db_index=False,
     )
 
     class Meta:
@@ -84,3 +189,105 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follow')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='posts_follow_author_user_idx'),
+        ]
+
+
+class FeedItem(models.Model):
+    """Запись ленты подписок.
+
+    При публикации пост раскладывается по лентам подписчиков. У авторов
+    с большим числом подписчиков создается одна общая запись без
+    пользователя, и такие посты подмешиваются в ленту при чтении.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        blank=True, null=True,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    # Копия даты поста: ленту листают по индексу записей, а посты
+    # подгружаются только для строк страницы.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_item')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='posts_feed_user_date_idx'),
+            models.Index(fields=['user', 'author', '-pub_date', '-post'],
+                         name='posts_feed_author_date_idx'),
+        ]
+
+
+class Suggestion(models.Model):
+    """Автор, которого стоит предложить пользователю.
+
+    Строится командой compute_suggestions по подпискам подписок;
+    score — число подписок пользователя, которые читают этого автора.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    score = models.PositiveIntegerField('Вес', default=0)
+
+    class Meta:
+        ordering = ['-score', 'pk']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_suggestion')
+        ]
+
+
+class TrendingPost(models.Model):
+    """Место поста в рейтинге «Популярное».
+
+    Таблицу целиком перестраивает команда compute_trending; страница
+    читает ее по индексу rank, не считая комментарии на лету.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+    )
+    rank = models.PositiveIntegerField('Место', unique=True)
+    score = models.FloatField('Вес')
+
+    class Meta:
+        ordering = ['rank']
+
+
+class PostDay(models.Model):
+    """Число постов за день в часовом поясе сайта.
+
+    Ведется сигналами и rebuild_counters; по этой таблице админка строит
+    переходы по датам, не группируя миллионы постов.
+    """
+    day = models.DateField('День', primary_key=True)
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+
+    class Meta:
+        ordering = ['day']
@@ -0,0 +1,209 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+MAX_TERMS = 10
+
+
+def parse_query(query):
+    """Слова запроса без операторов полнотекстового синтаксиса."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+class SearchBackend:
+    """Поисковый индекс постов.
+
+    Бэкенд обновляет индекс при сохранении и удалении постов и отдает
+    результаты объектом, который умеет count() и срезы: его можно
+    передать в Paginator.
+    """
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def index_many(self, posts):
+        """Индексирует посты queryset posts."""
+        for post in posts.only('text').iterator():
+            self.index(post)
+
+    def rebuild(self):
+        pass
+
+    def search(self, query):
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        """Оставляет в queryset постов совпадения с query, без порядка
+        по рангу: так ищет админка."""
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Поиск подстрок по таблице постов, без отдельного индекса."""
+
+    def search(self, query):
+        return self.filter(
+            Post.objects.for_feed().order_by('-pub_date', '-pk'), query
+        )
+
+    def filter(self, queryset, query):
+        terms = parse_query(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(text__icontains=term)
+        return queryset
+
+
+class RankedResults:
+    """Результаты FTS5, загружаемые по срезам.
+
+    Если совпадений больше SEARCH_RANK_LIMIT, они идут от новых к старым.
+    """
+
+    def __init__(self, backend, match):
+        self.backend = backend
+        self.match = match
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.match)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        # BM25 считается для каждого совпадения: для слишком частых слов
+        # ранжирование дороже и бесполезнее, чем порядок по новизне.
+        ranked = self.count() <= settings.SEARCH_RANK_LIMIT
+        ids = self.backend.ranked_ids(
+            self.match, start, index.stop - start, ranked
+        )
+        posts = Post.objects.for_feed().in_bulk(ids)
+        # Строки индекса без поста (удален в обход сигналов) пропускаем.
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Полнотекстовый индекс SQLite FTS5 с ранжированием по BM25.
+
+    Таблица индекса создается миграцией; rowid строки равен id поста.
+    """
+
+    table = 'posts_post_fts'
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {self.table}(rowid, text) '
+                f'VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+            )
+
+    def index_many(self, posts):
+        # Одна вставка из выборки: строки не проходят через Python.
+        sql, params = (
+            posts.order_by().values_list('pk', 'text')
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {self.table}(rowid, text) {sql}',
+                params,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table}(rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}'
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table}({self.table}) VALUES ('optimize')"
+            )
+
+    @staticmethod
+    def match(terms):
+        # Каждое слово в кавычках и с поиском по префиксу: пользовательский
+        # ввод не разбирается как синтаксис FTS5.
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, query):
+        terms = parse_query(query)
+        if not terms:
+            return Post.objects.none()
+        return RankedResults(self, self.match(terms))
+
+    def filter(self, queryset, query):
+        terms = parse_query(query)
+        if not terms:
+            return queryset.none()
+        # Не pk__in=RawSQL(...): Django оборачивает его в двойные скобки,
+        # и SQLite читает подзапрос как скаляр — остается одно совпадение.
+        column = '{}.{}'.format(
+            connection.ops.quote_name(Post._meta.db_table),
+            connection.ops.quote_name(Post._meta.pk.column),
+        )
+        return queryset.extra(
+            where=[
+                f'{column} IN (SELECT rowid FROM {self.table} '
+                f'WHERE {self.table} MATCH %s)'
+            ],
+            params=[self.match(terms)],
+        )
+
+    def count(self, match):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s',
+                [match],
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, match, offset, limit, ranked=True):
+        order = 'rank' if ranked else 'rowid DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} '
+                f'WHERE {self.table} MATCH %s '
+                f'ORDER BY {order} LIMIT %s OFFSET %s',
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.POSTS_SEARCH_BACKEND)()
+
+
+def update_index(post_id):
+    """Приводит строку индекса к тексту поста; удаленный пост убирает."""
+    text = Post.objects.filter(pk=post_id).values_list(
+        'text', flat=True
+    ).first()
+    if text is None:
+        get_backend().remove(post_id)
+    else:
+        get_backend().index(Post(pk=post_id, text=text))
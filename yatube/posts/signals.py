@@ -0,0 +1,230 @@
+from django.conf import settings
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import tasks
+
+from . import cache, counters, feed, search, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+# Поля, которые выводятся в чужих фрагментах: имя и ссылка автора,
+# название и ссылка группы.
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_DISPLAY_FIELDS = ('title', 'slug')
+
+
+def _old_values(instance, fields):
+    if instance.pk is None:
+        return None
+    return (
+        type(instance).objects.filter(pk=instance.pk)
+        .values(*fields).first()
+    )
+
+
+def _changed(instance, old, fields):
+    return old is not None and any(
+        old[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._old_display = None
+    if raw or update_fields is not None and not (
+        set(update_fields) & set(USER_DISPLAY_FIELDS)
+    ):
+        return
+    instance._old_display = _old_values(instance, USER_DISPLAY_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    old = getattr(instance, '_old_display', None)
+    if _changed(instance, old, USER_DISPLAY_FIELDS):
+        # Имя выводится во многих лентах: версии меняет фоновая задача.
+        cache.bump(cache.profile_scope(instance.pk))
+        tasks.enqueue(cache.bump_author, instance.pk)
+        cache.forget_user(old['username'])
+    elif not created and (
+        update_fields is None or set(update_fields) != {'last_login'}
+    ):
+        cache.bump(cache.profile_scope(instance.pk))
+    cache.forget_user(instance.username)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    cache.forget_user(instance.username)
+    cache.bump(cache.profile_scope(instance.pk))
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, raw=False, **kwargs):
+    instance._old_display = (
+        None if raw else _old_values(instance, GROUP_DISPLAY_FIELDS)
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_old_display', None)
+    if _changed(instance, old, GROUP_DISPLAY_FIELDS):
+        cache.bump(cache.group_scope(instance.pk))
+        tasks.enqueue(cache.bump_group, instance.pk)
+        cache.forget_group(old['slug'])
+    elif not created:
+        cache.bump(cache.group_scope(instance.pk))
+    cache.forget_group(instance.slug)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы: области собираем заранее.
+    instance._scopes = cache.group_scopes(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.forget_group(instance.slug)
+    cache.bump(
+        *getattr(instance, '_scopes', [cache.group_scope(instance.pk)])
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = None
+    if instance.pk:
+        old = Post.objects.filter(pk=instance.pk).only(
+            'group', 'author', 'image', 'text', 'thumbnail',
+            'image_variants',
+        ).first()
+    if old is not None:
+        instance._old_group_id = old.group_id
+        instance._old_author_id = old.author_id
+    instance._text_changed = old is None or old.text != instance.text
+    image_changed = instance.image.name != (old.image.name if old else '')
+    # Файлы старой картинки удаляются только после фиксации: до нее
+    # запись со старым манифестом еще видна другим запросам.
+    instance._stale_files = []
+    if image_changed:
+        if old is not None:
+            instance._stale_files = thumbnails.variant_files(old)
+        instance.thumbnail = ''
+        instance.image_variants = ''
+    instance._image_changed = image_changed and bool(instance.image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if getattr(instance, '_image_changed', False):
+        tasks.enqueue(thumbnails.generate, instance.pk)
+    if getattr(instance, '_stale_files', None):
+        tasks.enqueue(thumbnails.delete_files, instance._stale_files)
+    if getattr(instance, '_text_changed', True):
+        tasks.enqueue(search.update_index, instance.pk)
+    if created:
+        counters.user_stats_changed(instance.author_id, 'posts_count', 1)
+        counters.group_posts_changed(instance.group_id, 1)
+        counters.post_days_changed(instance.pub_date, 1)
+        readers = feed.fan_out(instance)
+        cache.bump(*cache.post_scopes(instance, [instance.group_id], readers))
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counters.group_posts_changed(old_group_id, -1)
+        counters.group_posts_changed(instance.group_id, 1)
+    readers = feed.readers(instance)
+    old_author_id = getattr(instance, '_old_author_id', instance.author_id)
+    if old_author_id != instance.author_id:
+        readers += _author_changed(instance, old_author_id)
+    cache.bump(
+        cache.post_scope(instance.pk),
+        *cache.post_scopes(
+            instance, [old_group_id, instance.group_id], readers
+        ),
+    )
+
+
+def _author_changed(post, old_author_id):
+    """Переносит пост к новому автору: счетчики, ленты подписчиков и
+    профиль прежнего автора. Возвращает новых читателей поста."""
+    counters.user_stats_changed(old_author_id, 'posts_count', -1)
+    counters.user_stats_changed(post.author_id, 'posts_count', 1)
+    cache.forget_post_author(post.pk)
+    cache.bump(cache.profile_scope(old_author_id))
+    return feed.rehome(post)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    instance._readers = feed.readers(instance)
+    instance._stale_files = thumbnails.variant_files(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    tasks.enqueue(search.update_index, instance.pk)
+    if getattr(instance, '_stale_files', None):
+        tasks.enqueue(thumbnails.delete_files, instance._stale_files)
+    counters.user_stats_changed(instance.author_id, 'posts_count', -1)
+    counters.group_posts_changed(instance.group_id, -1)
+    counters.post_days_changed(instance.pub_date, -1)
+    cache.bump(
+        cache.post_scope(instance.pk),
+        *cache.post_scopes(
+            instance,
+            [instance.group_id],
+            getattr(instance, '_readers', ()),
+        ),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.post_comments_changed(instance.post_id, 1)
+    cache.bump(cache.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.post_comments_changed(instance.post_id, -1)
+    cache.bump(cache.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follows_changed(instance.user_id, instance.author_id, 1)
+        # В запросе копируются только новые посты автора, остальные
+        # добавляет фоновая задача.
+        if feed.backfill(instance.user_id, instance.author_id,
+                         limit=settings.FEED_BACKFILL_LIMIT):
+            tasks.enqueue(
+                feed.backfill_rest, instance.user_id, instance.author_id
+            )
+        cache.bump(*cache.follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follows_changed(instance.user_id, instance.author_id, -1)
+    feed.prune(instance.user_id, instance.author_id)
+    cache.bump(*cache.follow_scopes(instance))
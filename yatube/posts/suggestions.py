@@ -0,0 +1,118 @@
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from . import cache
+from .following import followee_ids
+from .models import Follow, Suggestion, User
+
+
+def _candidates(user_ids):
+    """Авторы, которых читают подписки пользователей, с числом путей.
+
+    Один запрос на пачку: Follow f1 (пользователь → подписка) соединяется
+    с Follow f2 (подписка → автор).
+    """
+    pairs = (
+        Follow.objects.filter(user__following__user_id__in=user_ids)
+        .values_list('user__following__user_id', 'author_id')
+        .annotate(score=Count('pk'))
+        .order_by()
+    )
+    candidates = defaultdict(dict)
+    for user_id, author_id, score in pairs:
+        candidates[user_id][author_id] = score
+    return candidates
+
+
+def _followees(user_ids):
+    followees = defaultdict(set)
+    for user_id, author_id in Follow.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'author_id'):
+        followees[user_id].add(author_id)
+    return followees
+
+
+def popular_authors(limit):
+    """Самые читаемые авторы: подсказки для тех, у кого нет подписок."""
+    return list(
+        User.objects.filter(stats__followers_count__gt=0)
+        .order_by('-stats__followers_count', 'pk')
+        .values_list('pk', 'stats__followers_count')[:limit]
+    )
+
+
+def top_suggestions(user_id, candidates, followees, popular, limit):
+    """Лучшие limit авторов для пользователя: сначала друзья друзей,
+    свободные места занимают популярные авторы."""
+    skip = followees | {user_id}
+    best = heapq.nsmallest(
+        limit,
+        (
+            (-score, author_id) for author_id, score in candidates.items()
+            if author_id not in skip
+        ),
+    )
+    chosen = [(author_id, -score) for score, author_id in best]
+    taken = skip | {author_id for author_id, _ in chosen}
+    for author_id, _ in popular:
+        if len(chosen) >= limit:
+            break
+        if author_id not in taken:
+            chosen.append((author_id, 0))
+            taken.add(author_id)
+    return chosen
+
+
+def compute(user_ids, limit, popular):
+    """Пересчитывает подсказки для пачки пользователей."""
+    candidates = _candidates(user_ids)
+    followees = _followees(user_ids)
+    rows = [
+        Suggestion(user_id=user_id, author_id=author_id, score=score)
+        for user_id in user_ids
+        for author_id, score in top_suggestions(
+            user_id, candidates[user_id], followees[user_id], popular, limit
+        )
+    ]
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=user_ids).delete()
+        Suggestion.objects.bulk_create(rows)
+    cache.bump(*[cache.suggestions_scope(user_id) for user_id in user_ids])
+    return len(rows)
+
+
+def compute_all(batch_size, limit, progress=None):
+    """Пересчитывает подсказки всех пользователей пачками по batch_size."""
+    popular = popular_authors(limit * 2)
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    batch, total = [], 0
+    for user_id in user_ids.iterator():
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            total += compute(batch, limit, popular)
+            batch = []
+            if progress:
+                progress(total)
+    if batch:
+        total += compute(batch, limit, popular)
+    return total
+
+
+def for_user(user, limit, exclude=None):
+    """Сохраненные подсказки без авторов, на которых пользователь уже
+    подписан, и без автора exclude (например, открытого профиля)."""
+    if not user.is_authenticated:
+        return []
+    skip = followee_ids(user) | {exclude}
+    suggestions = (
+        Suggestion.objects.filter(user=user)
+        .select_related('author__stats')[:limit + len(skip)]
+    )
+    return [
+        suggestion.author for suggestion in suggestions
+        if suggestion.author_id not in skip
+    ][:limit]
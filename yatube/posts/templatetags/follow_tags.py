@@ -0,0 +1,29 @@
+from django import template
+
+from ..following import followee_ids
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def followed_authors(context, objects):
+    """id авторов из objects, на которых подписан текущий пользователь.
+
+    objects — посты или пользователи. Все проверки страницы делаются
+    одним обращением к множеству подписок:
+
+        {% followed_authors page_obj as followed %}
+        {% if post.author_id in followed %}...{% endif %}
+    """
+    request = context.get('request')
+    if request is None:
+        return frozenset()
+    ids = followee_ids(request.user)
+    return frozenset(
+        author_id for author_id in map(_author_id, objects)
+        if author_id in ids
+    )
+
+
+def _author_id(obj):
+    return getattr(obj, 'author_id', obj.pk)
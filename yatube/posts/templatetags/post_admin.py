@@ -0,0 +1,26 @@
+import copy
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+
+from ..admin import DayBuckets
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def day_hierarchy(cl):
+    """date_hierarchy по таблице PostDay.
+
+    Пока список сужен только датой, переходы строятся по дневным
+    счетчикам; с поиском или другими фильтрами — как в Django, по самим
+    постам, уже ограниченным фильтром.
+    """
+    year, month, day = (
+        f'{cl.date_hierarchy}__{part}' for part in ('year', 'month', 'day')
+    )
+    if cl.query or set(cl.get_filters_params()) - {year, month, day}:
+        return date_hierarchy(cl)
+    bucketed = copy.copy(cl)
+    bucketed.queryset = DayBuckets(cl.params.get(year), cl.params.get(month))
+    return date_hierarchy(bucketed)
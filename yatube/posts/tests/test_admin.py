@@ -0,0 +1,240 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import explicit_pub_date
+
+from .. import search
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='TestAdmin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description=''
+            )
+            for i in range(30)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        Post.objects.bulk_create([
+            Post(
+                text=f'Пост {i}',
+                author=self.admin,
+                group=self.groups[i % len(self.groups)],
+            )
+            for i in range(count)
+        ])
+
+    def changelist(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), params
+            )
+        self.sql = [query['sql'] for query in queries]
+        return response, len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        self.create_posts(3)
+        self.changelist()
+        cache.clear()
+        _, few = self.changelist()
+        self.create_posts(60)
+        cache.clear()
+        _, many = self.changelist()
+        self.assertEqual(few, many)
+
+    def test_rows_render_only_selected_group(self):
+        """В строке списка один вариант группы, а не все группы."""
+        self.create_posts(1)
+        response, _ = self.changelist()
+        content = response.content.decode()
+        self.assertIn('admin-autocomplete', content)
+        self.assertIn('>Группа 0</option>', content)
+        self.assertNotIn('>Группа 1</option>', content)
+
+    def test_changelist_edits_group(self):
+        self.create_posts(1)
+        post = Post.objects.get()
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'form-TOTAL_FORMS': '1',
+                'form-INITIAL_FORMS': '1',
+                'form-0-id': str(post.pk),
+                'form-0-group': str(self.groups[5].pk),
+                '_save': 'Сохранить',
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Post.objects.get().group, self.groups[5])
+
+    def test_count_is_cached_without_full_count(self):
+        """COUNT(*) выполняется один раз, полного счетчика нет."""
+        self.create_posts(3)
+        self.changelist()
+        self.assertEqual(
+            len([sql for sql in self.sql if 'COUNT(' in sql]), 1
+        )
+        response, _ = self.changelist()
+        self.assertFalse([sql for sql in self.sql if 'COUNT(' in sql])
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_date_hierarchy_reads_day_buckets(self):
+        """Переходы по датам строятся по PostDay, без группировки постов."""
+        with explicit_pub_date(Post):
+            for year in (2020, 2021):
+                Post.objects.create(
+                    text='Пост',
+                    author=self.admin,
+                    pub_date=timezone.make_aware(datetime(year, 5, 17, 12)),
+                )
+        response, _ = self.changelist()
+        self.assertContains(response, '?pub_date__year=2020')
+        self.assertContains(response, '?pub_date__year=2021')
+        self.assertFalse([
+            sql for sql in self.sql
+            if '"posts_post"' in sql and ('DISTINCT' in sql or 'MIN(' in sql)
+        ])
+        response, _ = self.changelist(
+            {'pub_date__year': 2021, 'pub_date__month': 5}
+        )
+        self.assertContains(response, 'pub_date__day=17')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_search_uses_index(self):
+        self.create_posts(3)
+        Post.objects.create(text='Особенный текст', author=self.admin)
+        search.get_backend().rebuild()
+        response, _ = self.changelist({'q': 'особенн'})
+        self.assertEqual(
+            [post.text for post in response.context['cl'].result_list],
+            ['Особенный текст'],
+        )
+        self.assertFalse([sql for sql in self.sql if 'LIKE' in sql])
+
+    def test_search_returns_every_match(self):
+        """Поиск по индексу находит все подходящие посты, а не первый."""
+        self.create_posts(5)
+        search.get_backend().rebuild()
+        response, _ = self.changelist({'q': 'пост'})
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='TestAdmin', email='admin@example.com', password='pass'
+        )
+        cls.users = [
+            User.objects.create_user(username=f'reader{i:02}')
+            for i in range(25)
+        ]
+        User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(
+            text='Особенный текст', author=cls.admin
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.users[0], text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def lookup(self, url_name, term):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name), {'term': term})
+        self.sql = [query['sql'] for query in queries]
+        return response.json()
+
+    def test_users_by_prefix_in_pages(self):
+        """Пользователи ищутся по началу имени постранично, без LIKE."""
+        data = self.lookup('admin:auth_user_autocomplete', 'reader')
+        self.assertEqual(len(data['results']), 20)
+        self.assertTrue(data['pagination']['more'])
+        self.assertEqual(data['results'][0]['text'], 'reader00')
+        self.assertFalse([sql for sql in self.sql if 'LIKE' in sql])
+        data = self.lookup('admin:auth_user_autocomplete', 'wri')
+        self.assertEqual(
+            [item['text'] for item in data['results']], ['writer']
+        )
+
+    def test_user_changelist_keeps_stock_search(self):
+        """Список пользователей ищет без учета регистра по имени,
+        фамилии и почте, как стандартный UserAdmin."""
+        User.objects.filter(username='writer').update(
+            first_name='Leo', last_name='Tolstoy', email='lev@example.com'
+        )
+        url = reverse('admin:auth_user_changelist')
+        for term in ('WRITER', 'leo', 'TOLST', 'LEV@EXAMPLE'):
+            with self.subTest(term=term):
+                response = self.client.get(url, {'q': term})
+                self.assertContains(response, '>writer<')
+
+    def test_groups_by_prefix(self):
+        """Группы в автодополнении ищутся по началу slug и названия."""
+        Group.objects.create(title='Котики', slug='cats')
+        Group.objects.create(title='Собаки', slug='dogs')
+        for term in ('ca', 'Кот'):
+            with self.subTest(term=term):
+                data = self.lookup('admin:posts_group_autocomplete', term)
+                self.assertEqual(
+                    [item['text'] for item in data['results']], ['Котики']
+                )
+                self.assertFalse([sql for sql in self.sql if 'LIKE' in sql])
+
+    def test_posts_by_search_index(self):
+        search.get_backend().rebuild()
+        data = self.lookup('admin:posts_post_autocomplete', 'особ')
+        self.assertEqual(
+            [item['id'] for item in data['results']], [str(self.post.pk)]
+        )
+        self.assertFalse([sql for sql in self.sql if 'LIKE' in sql])
+
+    def test_posts_autocomplete_lists_every_match(self):
+        other = Post.objects.create(
+            text='Особенный пример', author=self.admin
+        )
+        search.get_backend().rebuild()
+        data = self.lookup('admin:posts_post_autocomplete', 'особ')
+        self.assertEqual(
+            {item['id'] for item in data['results']},
+            {str(self.post.pk), str(other.pk)},
+        )
+
+    def test_change_forms_do_not_list_all_rows(self):
+        """Формы комментария, подписки и поста не выводят всех
+        пользователей и посты в <select>."""
+        follow = Follow.objects.create(user=self.users[1], author=self.admin)
+        urls = (
+            reverse('admin:posts_comment_change', args=[self.comment.pk]),
+            reverse('admin:posts_follow_change', args=[follow.pk]),
+            reverse('admin:posts_post_change', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'admin-autocomplete')
+                self.assertNotContains(response, 'reader24')
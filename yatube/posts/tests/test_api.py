@@ -0,0 +1,124 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            text='Тестовый текст',
+            author=self.user,
+            group=self.group,
+        )
+
+    def test_post_fields(self):
+        """Пост отдается со всеми полями."""
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        )
+        data = response.json()
+        self.assertEqual(data['id'], self.post.pk)
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['author'], self.user.username)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['comments_count'], 0)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pagination(self):
+        """Курсор next ведет на следующую страницу ленты."""
+        newer = Post.objects.create(text='Новый пост', author=self.user)
+        data = self.client.get(reverse('posts:api_index')).json()
+        self.assertEqual([post['id'] for post in data['results']], [newer.pk])
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']], [self.post.pk]
+        )
+        self.assertIsNone(data['next'])
+
+    def test_not_modified_without_post_queries(self):
+        """Повторный запрос с ETag получает 304 без запросов к базе."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_new_post_changes_etag(self):
+        """Новый пост меняет ETag ленты группы."""
+        url = reverse('posts:api_group_list', args=[self.group.slug])
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(
+            text='Еще пост', author=self.user, group=self.group
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_if_modified_since(self):
+        """Last-Modified позволяет получить 304 без ETag."""
+        url = reverse('posts:api_profile', args=[self.user.username])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag поста."""
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.post.comments.create(author=self.user, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['comments_count'], 1)
+
+    def test_unknown_objects(self):
+        """Несуществующие группа, автор и пост отдают 404."""
+        urls = (
+            reverse('posts:api_group_list', args=['missing']),
+            reverse('posts:api_profile', args=['missing']),
+            reverse('posts:api_post_detail', args=[self.post.pk + 1]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только авторизованному пользователю."""
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        reader = User.objects.create_user(username='Reader')
+        client = Client()
+        client.force_login(reader)
+        Follow.objects.create(user=reader, author=self.user)
+        response = client.get(reverse('posts:api_follow_index'))
+        self.assertIn('private', response['Cache-Control'])
+        data = response.json()
+        self.assertEqual(
+            [post['id'] for post in data['results']], [self.post.pk]
+        )
+
+    def test_list_items_omit_comments_count(self):
+        """Число комментариев есть только в ответе поста: комментарий
+        не меняет версии лент."""
+        self.post.comments.create(author=self.user, text='Комментарий')
+        data = self.client.get(reverse('posts:api_index')).json()
+        self.assertNotIn('comments_count', data['results'][0])
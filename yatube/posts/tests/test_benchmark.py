@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import models
+from django.test import TestCase, override_settings
+
+from .. import benchmark
+from ..models import Comment, Follow, Post
+from ..urls import urlpatterns
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        call_command(
+            'seed_posts', users=20, groups=3, posts=200, comments=100,
+            image_share=0.2, image_files=2, words=200, stdout=StringIO(),
+        )
+        self.output = os.path.join(TEMP_MEDIA_ROOT, 'results.json')
+
+    def test_seed_is_deterministic(self):
+        """Повторный запуск генератора с тем же seed дает те же данные."""
+        posts = list(Post.objects.order_by('pk').values_list(
+            'text', 'image', 'pub_date'
+        ))
+        comments = list(Comment.objects.order_by('pk').values_list(
+            'text', 'pub_date'
+        ))
+        follows = set(Follow.objects.values_list(
+            'user__username', 'author__username'
+        ))
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        call_command(
+            'seed_posts', users=20, groups=3, posts=200, comments=100,
+            image_share=0.2, image_files=2, words=200, stdout=StringIO(),
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'image', 'pub_date'
+            )),
+            posts,
+        )
+        self.assertEqual(
+            list(Comment.objects.order_by('pk').values_list(
+                'text', 'pub_date'
+            )),
+            comments,
+        )
+        self.assertEqual(
+            set(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+            follows,
+        )
+
+    def test_seed_data(self):
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(
+            Follow.objects.filter(user=models.F('author')).exists()
+        )
+
+    def test_every_url_measured(self):
+        call_command(
+            'benchmark_views', requests=3, warmup=1, output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output, encoding='utf-8') as stream:
+            results = json.load(stream)
+        self.assertEqual(
+            set(results['results']),
+            {f'posts:{pattern.name}' for pattern in urlpatterns},
+        )
+        for name, result in results['results'].items():
+            with self.subTest(name=name):
+                self.assertEqual(result['errors'], 0)
+                self.assertEqual(result['requests'], 3)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(
+            results['results']['posts:follow_index']['statuses'], {'200': 3}
+        )
+        self.assertEqual(results['data']['posts'], 200)
+
+    def test_explain_feeds_with_sparse_ids(self):
+        """Глубокая страница считается от числа постов: пропуски в id
+        после удалений не роняют команду."""
+        kept = Post.objects.order_by('-pk')[20].pk
+        Post.objects.filter(pk__lt=kept).delete()
+        output = StringIO()
+        call_command(
+            'explain_feeds', repeat=1, no_plans=True, depth=0.9,
+            stdout=output,
+        )
+        self.assertIn('глубокая страница, курсор', output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('explain_feeds', depth=1.5, stdout=StringIO())
+
+    def test_follow_state_restored(self):
+        follows = set(Follow.objects.values_list('user_id', 'author_id'))
+        call_command(
+            'benchmark_views', requests=2, warmup=0, stdout=StringIO(),
+            only=['posts:profile_follow', 'posts:profile_unfollow'],
+        )
+        self.assertEqual(
+            set(Follow.objects.values_list('user_id', 'author_id')), follows
+        )
+
+    def test_regression_flagged(self):
+        call_command(
+            'benchmark_views', requests=2, warmup=0, output=self.output,
+            only=['posts:index'], stdout=StringIO(),
+        )
+        with open(self.output, encoding='utf-8') as stream:
+            results = json.load(stream)
+        results['results']['posts:index']['p50_ms'] = 0.0001
+        with open(self.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_views', requests=2, warmup=0,
+                baseline=self.output, only=['posts:index'],
+                stdout=StringIO(),
+            )
+
+
+class CompareTests(TestCase):
+    def results(self, p50, p99):
+        return {'results': {'posts:index': {'p50_ms': p50, 'p99_ms': p99}}}
+
+    def test_within_threshold(self):
+        self.assertEqual(
+            benchmark.compare(
+                self.results(11, 20), self.results(10, 20), 0.2
+            ),
+            [],
+        )
+
+    def test_slower_p99(self):
+        self.assertEqual(
+            benchmark.compare(
+                self.results(10, 30), self.results(10, 20), 0.2
+            ),
+            [('posts:index', 'p99_ms', 20, 30)],
+        )
+
+    def test_new_page_not_compared(self):
+        self.assertEqual(
+            benchmark.compare(self.results(10, 20), {'results': {}}, 0.2),
+            [],
+        )
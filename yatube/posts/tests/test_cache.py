@@ -1,9 +1,10 @@
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
+from .utils import OnCommitMixin
 
 User = get_user_model()
 
@@ -37,3 +38,184 @@ class CacheTest(TestCase):
         cache.clear()
         response = self.client.get(reverse('posts:index'))
         self.assertFalse(self.post.text.encode() in response.content)
+
+
+@override_settings(TASKS_BACKEND='core.tasks.InlineBackend')
+class VersionedFragmentCacheTest(OnCommitMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.user = User.objects.create_user(username='TestReader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            text='Первый пост',
+            author=self.author,
+            group=self.group,
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+        )
+
+    def test_pages_are_served_from_cache(self):
+        """Неизмененные страницы отдаются из кеша фрагментов"""
+        for url in self.urls:
+            self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Первый пост')
+
+    def test_cached_index_skips_post_query(self):
+        """Попадание в кеш не выполняет запрос постов"""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Первый пост')
+
+    def test_new_post_is_visible_immediately(self):
+        """Новый пост сразу виден на всех страницах"""
+        for url in self.urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            text='Второй пост', author=self.author, group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Второй пост')
+
+    def test_edit_and_delete_invalidate_pages(self):
+        """Правка и удаление поста сбрасывают кеш страниц"""
+        for url in self.urls:
+            self.authorized_client.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Исправленный пост')
+        self.post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotContains(response, 'Исправленный пост')
+
+    def test_author_rename_invalidates_pages(self):
+        """Новое имя автора сразу видно во всех лентах с его постами"""
+        for url in self.urls:
+            self.authorized_client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = 'RenamedAuthor'
+            self.author.save()
+        for url in self.urls[:2] + self.urls[3:]:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, '/profile/RenamedAuthor/')
+                self.assertNotContains(response, '/profile/TestAuthor/')
+
+    def test_group_rename_invalidates_pages(self):
+        """Новый адрес группы сразу виден в лентах и профилях"""
+        for url in self.urls:
+            self.authorized_client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.slug = 'renamed-slug'
+            self.group.save()
+        for url in self.urls[:1] + self.urls[2:]:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, '/group/renamed-slug/')
+                self.assertNotContains(response, '/group/test-slug/')
+
+    def test_unfollow_invalidates_feed(self):
+        """Отписка сбрасывает кеш ленты подписок"""
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        Follow.objects.filter(user=self.user).delete()
+        response = self.authorized_client.get(url)
+        self.assertNotContains(response, 'Первый пост')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.post = Post.objects.create(text='Тестовый текст',
+                                        author=self.author)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+
+    def revalidate(self, client, url, etag):
+        return client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_pages_vary_by_user(self):
+        """ETag страницы свой у каждого пользователя, ответ private."""
+        guest = self.client.get(self.profile_url)
+        reader = self.reader_client.get(self.profile_url)
+        self.assertNotEqual(guest['ETag'], reader['ETag'])
+        self.assertIn('private', reader['Cache-Control'])
+        self.assertNotIn('private', guest['Cache-Control'])
+        self.assertIn('Cookie', reader['Vary'])
+        self.assertEqual(
+            self.revalidate(self.client, self.profile_url, reader['ETag']),
+            200,
+        )
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля для подписавшегося."""
+        etag = self.reader_client.get(self.profile_url)['ETag']
+        self.assertEqual(
+            self.revalidate(self.reader_client, self.profile_url, etag), 304
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(self.reader_client, self.profile_url, etag), 200
+        )
+
+    def test_author_post_changes_post_page_etag(self):
+        """Новый пост автора меняет ETag страниц его постов."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(self.client, url, etag), 304)
+        Post.objects.create(text='Еще пост', author=self.author)
+        self.assertEqual(self.revalidate(self.client, url, etag), 200)
+
+    def test_author_change_follows_new_author(self):
+        """После смены автора страница поста зависит от нового автора,
+        а профиль прежнего устаревает."""
+        other = User.objects.create_user(username='Other')
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        profile_etag = self.client.get(self.profile_url)['ETag']
+        self.client.get(url)
+        self.post.author = other
+        self.post.save()
+        self.assertEqual(
+            self.revalidate(self.client, self.profile_url, profile_etag), 200
+        )
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Еще пост', author=other)
+        self.assertEqual(self.revalidate(self.client, url, etag), 200)
+
+    def test_renamed_group_is_not_modified_no_more(self):
+        """Старый адрес переименованной группы не отвечает 304."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        url = reverse('posts:group_list', kwargs={'slug': 'old-slug'})
+        etag = self.client.get(url)['ETag']
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(self.revalidate(self.client, url, etag), 404)
@@ -0,0 +1,157 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, PostDay, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+        self.post = Post.objects.create(
+            text='Тестовый текст',
+            author=self.user,
+            group=self.group,
+        )
+
+    def assertCounters(self, posts, group_posts, other_group_posts):
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).posts_count, posts
+        )
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, group_posts
+        )
+        self.assertEqual(
+            Group.objects.get(pk=self.other_group.pk).posts_count,
+            other_group_posts
+        )
+
+    def test_post_counters_follow_create_edit_delete(self):
+        """Счетчики постов меняются при создании, правке и удалении."""
+        self.assertCounters(1, 1, 0)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'group': self.other_group.id},
+        )
+        self.assertCounters(1, 0, 1)
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertCounters(0, 0, 0)
+
+    def test_author_change_moves_post_count(self):
+        """Смена автора в правке переносит пост в счетчик нового автора."""
+        other = User.objects.create_user(username='OtherUser')
+        self.post.author = other
+        self.post.save()
+        self.assertCounters(0, 1, 0)
+        self.assertEqual(UserStats.objects.get(user=other).posts_count, 1)
+
+    def test_comment_counter(self):
+        """Счетчик комментариев меняется при создании и удалении."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+        Comment.objects.all().delete()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 0)
+
+    def test_save_does_not_overwrite_counters(self):
+        """Сохранение устаревшего объекта не затирает счетчики."""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        stale.text = 'Новый текст'
+        stale.save()
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters пересчитывает счетчики с нуля."""
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        UserStats.objects.all().delete()
+        Group.objects.update(posts_count=7)
+        Post.objects.update(comments_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(1, 1, 0)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счетчики читателя и автора."""
+        reader = User.objects.create_user(username='TestReader')
+        client = Client()
+        client.force_login(reader)
+        url = reverse(
+            'posts:profile_follow', kwargs={'username': self.user.username}
+        )
+        client.get(url)
+        client.get(url)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).followers_count, 1
+        )
+        self.assertEqual(UserStats.objects.get(user=reader).following_count, 1)
+        client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.user.username}
+        ))
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).followers_count, 0
+        )
+        self.assertEqual(UserStats.objects.get(user=reader).following_count, 0)
+
+    def test_rebuild_follow_counters(self):
+        reader = User.objects.create_user(username='TestReader')
+        Follow.objects.create(user=reader, author=self.user)
+        UserStats.objects.update(followers_count=5, following_count=5)
+        call_command('rebuild_counters', stdout=StringIO())
+        for user, expected in ((self.user, (1, 0)), (reader, (0, 1))):
+            stats = UserStats.objects.get(user=user)
+            self.assertEqual(
+                (stats.followers_count, stats.following_count), expected
+            )
+
+    def test_post_days(self):
+        """Дневные счетчики постов ведутся сигналами и rebuild_counters."""
+        day = timezone.localdate(self.post.pub_date)
+        self.assertEqual(PostDay.objects.get(day=day).posts_count, 1)
+        Post.objects.create(text='Второй пост', author=self.user)
+        self.assertEqual(PostDay.objects.get(day=day).posts_count, 2)
+        self.post.delete()
+        self.assertEqual(PostDay.objects.get(day=day).posts_count, 1)
+        PostDay.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(
+            list(PostDay.objects.values_list('day', 'posts_count')),
+            [(day, 1)],
+        )
+
+    def test_pages_do_not_count_posts(self):
+        """Профиль и страница поста не выполняют COUNT."""
+        urls = (
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(response.context['num_post'], 1)
+                self.assertFalse(
+                    [q for q in queries if 'COUNT(' in q['sql']]
+                )
@@ -1,10 +1,26 @@
 from http import HTTPStatus
+from io import StringIO
+
+from datetime import timedelta
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template import RequestContext, Template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from core.models import explicit_pub_date
 
-from ..models import Follow, Post
+from .. import following, suggestions
+from ..feed import FeedPaginator
+from ..models import FeedItem, Follow, Post, Suggestion
+from .utils import OnCommitMixin
 
 User = get_user_model()
 
@@ -98,3 +114,292 @@ class FollowViewsTests(TestCase):
                                    kwargs={'username': author.username}))
         response = (self.authorized_client.get(reverse('posts:follow_index')))
         self.assertNotContains(response, self.post.text)
+
+
+class FeedFanOutTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.user = User.objects.create_user(username='TestFollower')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed_posts(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает в ленты подписчиков при записи"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            FeedItem.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.feed_posts(), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту, отписка очищает ее"""
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed_posts(), [post])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author.username}))
+        self.assertFalse(FeedItem.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed_posts(), [])
+
+    @override_settings(FEED_BACKFILL_LIMIT=1,
+                       TASKS_BACKEND='core.tasks.InlineBackend')
+    def test_backfill_beyond_limit_runs_in_background(self):
+        """В запросе подписки копируются только новые посты автора"""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks() as callbacks:
+            Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            list(FeedItem.objects.values_list('post', flat=True)),
+            [posts[-1].pk],
+        )
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.feed_posts(), posts[::-1])
+
+    def test_author_change_moves_post_between_feeds(self):
+        """Пост со сменившимся автором переходит к подписчикам нового"""
+        other = User.objects.create_user(username='OtherAuthor')
+        other_reader = User.objects.create_user(username='OtherFollower')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other_reader, author=other)
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.author = other
+        post.save()
+        self.assertEqual(self.feed_posts(), [])
+        self.assertEqual(
+            list(FeedItem.objects.values_list('user', 'author')),
+            [(other_reader.pk, other.pk)],
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярных авторов читаются из общей записи"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Популярный пост')
+        self.assertEqual(
+            list(FeedItem.objects.values_list('user', 'post')),
+            [(None, post.pk)],
+        )
+        self.assertEqual(self.feed_posts(), [post])
+
+
+@override_settings(FEED_FANOUT_LIMIT=1)
+class FeedPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.star = User.objects.create_user(username='TestStar')
+        fan = User.objects.create_user(username='TestFan')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=fan, author=cls.star)
+        now = timezone.now()
+        with explicit_pub_date(Post):
+            for i in range(7):
+                Post.objects.create(
+                    author=cls.star if i % 2 else cls.author,
+                    text=f'Пост {i}',
+                    pub_date=now - timedelta(minutes=i // 2),
+                )
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def test_cursor_walk_merges_inbox_and_shared_items(self):
+        """Курсоры проходят личные и общие записи ленты по порядку."""
+        self.assertEqual(
+            FeedItem.objects.filter(user__isnull=True).count(), 3
+        )
+        paginator = FeedPaginator(self.reader, 2)
+        pages = [paginator.get_cursor_page(None)]
+        while pages[-1].next_cursor():
+            pages.append(paginator.get_cursor_page(pages[-1].next_cursor()))
+        self.assertEqual(
+            [post for page in pages for post in page], self.expected
+        )
+        back = paginator.get_cursor_page(pages[2].previous_cursor())
+        self.assertEqual(list(back), list(pages[1]))
+
+    def test_inbox_is_read_by_index(self):
+        """Записи ленты читаются по индексу, без сортировки всей ленты."""
+        paginator = FeedPaginator(self.reader, 2)
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_cursor_page(None))
+        inbox = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT "posts_feeditem"')
+        ]
+        self.assertEqual(len(inbox), 2)
+        for sql in inbox:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class FolloweeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='TestReader')
+        self.authors = [
+            User.objects.create_user(username=f'TestAuthor{i}')
+            for i in range(3)
+        ]
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        self.client.force_login(self.reader)
+
+    def fresh_reader(self):
+        # Новый объект пользователя — как в следующем запросе.
+        return User.objects.get(pk=self.reader.pk)
+
+    def test_followees_loaded_once(self):
+        """Подписки читаются из базы один раз, дальше — из кеша."""
+        reader = self.fresh_reader()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                following.followee_ids(reader),
+                {self.authors[0].pk, self.authors[2].pk},
+            )
+            self.assertTrue(
+                following.is_following(reader, self.authors[0].pk)
+            )
+            self.assertFalse(
+                following.is_following(reader, self.authors[1].pk)
+            )
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                following.is_following(reader, self.authors[2].pk)
+            )
+
+    def test_follow_and_unfollow_invalidate(self):
+        following.followee_ids(self.fresh_reader())
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.authors[1].username},
+        ))
+        self.assertTrue(
+            following.is_following(self.fresh_reader(), self.authors[1].pk)
+        )
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.authors[0].username},
+        ))
+        self.assertEqual(
+            following.followee_ids(self.fresh_reader()),
+            {self.authors[1].pk, self.authors[2].pk},
+        )
+
+    def test_profile_button_without_follow_query(self):
+        """Страница профиля не запрашивает подписки, когда они в кеше."""
+        url = reverse(
+            'posts:profile', kwargs={'username': self.authors[0].username}
+        )
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertFalse(
+            [query for query in queries if 'posts_follow' in query['sql']]
+        )
+
+    def test_template_tag_checks_page_in_one_lookup(self):
+        posts = [
+            Post.objects.create(author=author, text='Пост')
+            for author in self.authors * 2
+        ]
+        request = RequestFactory().get('/')
+        request.user = self.fresh_reader()
+        template = Template(
+            '{% load follow_tags %}'
+            '{% followed_authors posts as followed %}'
+            '{% for post in posts %}'
+            '{% if post.author_id in followed %}+{% else %}-{% endif %}'
+            '{% endfor %}'
+        )
+        with self.assertNumQueries(1):
+            rendered = template.render(
+                RequestContext(request, {'posts': posts})
+            )
+        self.assertEqual(rendered, '+-++-+')
+
+    def test_forget_clears_lazy_request_user(self):
+        """Сброс доходит до пользователя внутри SimpleLazyObject."""
+        reader = self.fresh_reader()
+        user = SimpleLazyObject(lambda: reader)
+        following.followee_ids(user)
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        following.forget(user)
+        self.assertIn(self.authors[1].pk, following.followee_ids(user))
+
+    def test_guest_follows_nobody(self):
+        self.assertEqual(following.followee_ids(AnonymousUser()), set())
+
+
+class SuggestionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader, self.friend, self.author, self.popular, self.other = [
+            User.objects.create_user(username=f'TestUser{i}')
+            for i in range(5)
+        ]
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.author)
+        Follow.objects.create(user=self.friend, author=self.reader)
+        for user in (self.friend, self.author, self.other):
+            Follow.objects.create(user=user, author=self.popular)
+
+    def suggested(self, user):
+        return list(
+            Suggestion.objects.filter(user=user)
+            .values_list('author_id', flat=True)
+        )
+
+    def test_friends_of_friends_first(self):
+        """Сначала авторы, которых читают подписки, затем популярные;
+        без самого пользователя и его подписок."""
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertEqual(
+            self.suggested(self.reader), [self.author.pk, self.popular.pk]
+        )
+        # Без подписок остаются только популярные авторы.
+        self.assertEqual(
+            self.suggested(self.popular),
+            [self.reader.pk, self.friend.pk, self.author.pk],
+        )
+
+    def test_limit_and_recompute(self):
+        suggestions.compute_all(batch_size=2, limit=1)
+        self.assertEqual(self.suggested(self.reader), [self.author.pk])
+        Follow.objects.create(user=self.reader, author=self.author)
+        suggestions.compute_all(batch_size=2, limit=1)
+        self.assertEqual(self.suggested(self.reader), [self.popular.pk])
+
+    def test_profile_reads_precomputed_list(self):
+        suggestions.compute_all(batch_size=10, limit=5)
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse(
+            'posts:profile', kwargs={'username': self.popular.username}
+        )
+        response = client.get(url)
+        self.assertEqual(response.context['suggestions'], [self.author])
+        self.assertEqual(response.context['num_followers'], 3)
+        client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username},
+        ))
+        response = client.get(url)
+        self.assertEqual(response.context['suggestions'], [])
+        self.assertEqual(response.context['num_following'], 0)
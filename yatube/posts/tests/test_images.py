@@ -0,0 +1,68 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+
+
+def png_upload(size, name='picture.png'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, format='PNG')
+    return SimpleUploadedFile(
+        name=name, content=buffer.getvalue(), content_type='image/png'
+    )
+
+
+def bound_form(upload):
+    return PostForm(data={'text': 'Тестовый текст'}, files={'image': upload})
+
+
+class PostImageFieldTests(TestCase):
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=10)
+    def test_large_file_rejected(self):
+        """Файл больше лимита не принимается."""
+        form = bound_form(png_upload((10, 10)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'file_too_large'
+        )
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_large_resolution_rejected(self):
+        """Картинка с разрешением больше лимита не принимается."""
+        form = bound_form(png_upload((20, 10)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'too_many_pixels'
+        )
+
+    @override_settings(IMAGE_UPLOAD_FORMATS=('JPEG',))
+    def test_unlisted_format_rejected(self):
+        """Формат не из списка разрешенных не принимается."""
+        form = bound_form(png_upload((10, 10)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'invalid_format'
+        )
+
+    def test_not_an_image_rejected(self):
+        """Файл, который не является картинкой, не принимается."""
+        upload = SimpleUploadedFile(
+            name='picture.png', content=b'text', content_type='image/png'
+        )
+        form = bound_form(upload)
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(IMAGE_MAX_SIZE=(100, 100))
+    def test_image_is_downscaled(self):
+        """Принятая картинка уменьшается, сохраняя формат и имя файла."""
+        form = bound_form(png_upload((400, 200)))
+        self.assertTrue(form.is_valid())
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'picture.png')
+        with Image.open(image) as normalized:
+            self.assertEqual(normalized.format, 'PNG')
+            self.assertEqual(normalized.size, (100, 50))
@@ -0,0 +1,181 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..utils import KeysetPaginator
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.bulk_create(
+            [
+                Post(text=f'Пост {i}', author=cls.user)
+                for i in range(settings.POSTS_PER_PAGE * 2 + 3)
+            ]
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def paginator(self):
+        return KeysetPaginator(Post.objects.all(), settings.POSTS_PER_PAGE)
+
+    def walk(self, paginator):
+        page = paginator.get_cursor_page(None)
+        seen = list(page)
+        while page.next_cursor():
+            page = paginator.get_cursor_page(page.next_cursor())
+            seen.extend(page)
+        return page, seen
+
+    def test_cursor_walk_matches_ordering(self):
+        """Курсоры проходят все посты по порядку и без повторов."""
+        paginator = self.paginator()
+        _, seen = self.walk(paginator)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу."""
+        paginator = self.paginator()
+        first = paginator.get_cursor_page(None)
+        second = paginator.get_cursor_page(first.next_cursor())
+        third = paginator.get_cursor_page(second.next_cursor())
+        back = paginator.get_cursor_page(third.previous_cursor())
+        self.assertEqual(list(back), list(second))
+        back = paginator.get_cursor_page(back.previous_cursor())
+        self.assertEqual(list(back), list(first))
+        self.assertIsNone(back.previous_cursor())
+
+    def test_cursor_page_runs_single_query(self):
+        """Курсорная страница строится одним запросом, без COUNT."""
+        paginator = self.paginator()
+        token = paginator.get_cursor_page(None).next_cursor()
+        with self.assertNumQueries(1):
+            page = paginator.get_cursor_page(token)
+            self.assertEqual(len(page), settings.POSTS_PER_PAGE)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор отдает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(Post.objects.order_by('-pub_date', '-pk')[
+                :settings.POSTS_PER_PAGE
+            ]),
+        )
+
+    def test_views_render_cursor_links(self):
+        """Страницы ленты отдают ссылки на следующий курсор."""
+        response = self.guest_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertContains(response, f'?cursor={page_obj.next_cursor()}')
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            {'cursor': page_obj.next_cursor()},
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_PER_PAGE
+        )
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user
+        )
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(settings.COMMENTS_PER_PAGE * 2 + 3)
+        ])
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def expected(self):
+        return list(
+            Comment.objects.filter(post=self.post).order_by('-pub_date', '-pk')
+        )
+
+    def test_post_detail_inlines_first_page(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments), self.expected()[:settings.COMMENTS_PER_PAGE]
+        )
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+            + f'?cursor={comments.next_cursor()}',
+        )
+
+    def test_fragments_cover_thread(self):
+        """Фрагменты по курсорам отдают все комментарии без повторов."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        seen = list(response.context['comments'])
+        while response.context['comments'].next_cursor():
+            response = self.guest_client.get(
+                url, {'cursor': response.context['comments'].next_cursor()}
+            )
+            self.assertNotContains(response, '<html')
+            seen.extend(response.context['comments'])
+        self.assertEqual(seen, self.expected())
+
+    def test_api_comments(self):
+        url = reverse(
+            'posts:api_post_comments', kwargs={'post_id': self.post.id}
+        )
+        data = self.guest_client.get(url).json()
+        self.assertEqual(len(data['results']), settings.COMMENTS_PER_PAGE)
+        newest = self.expected()[0]
+        self.assertEqual(data['results'][0], {
+            'id': newest.pk,
+            'text': newest.text,
+            'pub_date': newest.pub_date.isoformat(),
+            'author': self.user.username,
+        })
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['results']],
+            [comment.pk for comment in self.expected()[
+                settings.COMMENTS_PER_PAGE:settings.COMMENTS_PER_PAGE * 2
+            ]],
+        )
+        self.assertIsNotNone(data['previous'])
+
+    def test_missing_post_comments_not_found(self):
+        for name in ('posts:post_comments', 'posts:api_post_comments'):
+            with self.subTest(name=name):
+                response = self.guest_client.get(
+                    reverse(name, kwargs={'post_id': self.post.id + 100})
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_new_comment_changes_fragment(self):
+        """Новый комментарий виден во фрагменте сразу."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Свежий комментарий')
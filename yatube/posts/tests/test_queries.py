@@ -0,0 +1,190 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users import auth
+
+from ..models import Comment, Follow, Group, Post
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+# Бюджеты не зависят от числа постов и комментариев на странице.
+# В группе, профиле и посте один запрос находит объект для ETag, пока
+# соответствие не попало в кеш.
+GUEST_BUDGETS = {
+    'posts:index': 1,
+    'posts:trending': 1,
+    'posts:group_list': 3,
+    'posts:profile': 3,
+    'posts:post_detail': 3,
+    'posts:post_comments': 1,
+}
+# Вошедший пользователь берется из снимка в кеше: после первого запроса
+# его страницы стоят столько же, сколько гостевые, плюс его подписки.
+AUTHORIZED_BUDGETS = {
+    'posts:index': 1,
+    'posts:trending': 1,
+    'posts:group_list': 3,
+    'posts:profile': 5,
+    'posts:post_detail': 3,
+    # Популярные подписки, записи ленты по индексу и посты страницы.
+    'posts:follow_index': 3,
+    'posts:post_comments': 1,
+}
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        authors = [
+            User.objects.create_user(username=f'TestAuthor{i}')
+            for i in range(5)
+        ]
+        for i in range(15):
+            author = authors[i % len(authors)]
+            Post.objects.create(
+                text=f'Пост {i}', author=author, group=cls.group
+            )
+            Follow.objects.get_or_create(user=cls.user, author=author)
+        cls.post = Post.objects.first()
+        # Комментариев больше страницы: обсуждение подгружается частями.
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post,
+                author=authors[i % len(authors)],
+                text=f'Комментарий {i}',
+            )
+            for i in range(settings.COMMENTS_PER_PAGE * 3)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:trending': reverse('posts:trending'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile',
+                kwargs={'username': self.post.author.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:post_comments': reverse(
+                'posts:post_comments', kwargs={'post_id': self.post.id}
+            ),
+        }
+
+    def test_guest_query_budget(self):
+        """Страницы для гостя укладываются в бюджет запросов."""
+        urls = self.urls()
+        for name, budget in GUEST_BUDGETS.items():
+            with self.subTest(view=name):
+                self.assertQueryBudget(self.guest_client, urls[name], budget)
+
+    def test_authorized_query_budget(self):
+        """Страницы для пользователя укладываются в бюджет запросов."""
+        urls = self.urls()
+        self.authorized_client.get(urls['posts:index'])
+        for name, budget in AUTHORIZED_BUDGETS.items():
+            with self.subTest(view=name):
+                self.assertQueryBudget(
+                    self.authorized_client, urls[name], budget
+                )
+
+    def test_not_modified_budget(self):
+        """Повторная проверка страницы гостем не обращается к базе."""
+        for name, url in self.urls().items():
+            if name == 'posts:follow_index':
+                continue
+            with self.subTest(view=name):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+
+
+class IdentitySnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='TestReader', password='old-password-1'
+        )
+        self.client.login(username='TestReader', password='old-password-1')
+        self.other_client = Client()
+        self.other_client.login(
+            username='TestReader', password='old-password-1'
+        )
+
+    def identity_queries(self, client, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        return response, [
+            query['sql'] for query in queries
+            if '"auth_user"."password"' in query['sql']
+            or 'django_session' in query['sql']
+        ]
+
+    def test_feed_without_identity_queries(self):
+        """Сессия и пользователь берутся из кеша, а не из базы."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        response, queries = self.identity_queries(self.client, url)
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual(queries, [])
+
+    def test_password_change_ends_other_sessions(self):
+        url = reverse('posts:follow_index')
+        self.other_client.get(url)
+        self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-1',
+            'new_password1': 'new-password-2',
+            'new_password2': 'new-password-2',
+        })
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.other_client.get(url).status_code, 302)
+
+    def test_logout_drops_snapshot(self):
+        self.client.get(reverse('posts:follow_index'))
+        sessions = caches[settings.SESSION_CACHE_ALIAS]
+        self.assertIsNotNone(sessions.get(auth._key(self.user.pk)))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(sessions.get(auth._key(self.user.pk)))
+
+    def test_late_snapshot_not_served(self):
+        """Снимок, загруженный из базы до смены пароля и записанный после
+        нее, не продлевает старые сессии."""
+        url = reverse('posts:follow_index')
+        sessions = caches[settings.SESSION_CACHE_ALIAS]
+        # Медленный запрос другой сессии прочитал ключ и пользователя
+        # до смены пароля.
+        key = auth._key(self.user.pk)
+        stale = User.objects.get(pk=self.user.pk)
+        self.client.post(reverse('users:password_change'), {
+            'old_password': 'old-password-1',
+            'new_password1': 'new-password-2',
+            'new_password2': 'new-password-2',
+        })
+        sessions.set(key, stale, settings.USER_SNAPSHOT_TIMEOUT)
+        self.assertEqual(self.other_client.get(url).status_code, 302)
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from .utils import OnCommitMixin
+
+User = get_user_model()
+
+
+@override_settings(TASKS_BACKEND='core.tasks.InlineBackend')
+class SearchTests(OnCommitMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apple = Post.objects.create(
+                text='Яблоки и груши', author=self.user
+            )
+            self.apples = Post.objects.create(
+                text='Яблоки, яблоки и еще раз яблоки', author=self.user
+            )
+            Post.objects.create(text='Сливы', author=self.user)
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_results_are_ranked(self):
+        """Посты с большим числом совпадений идут первыми."""
+        self.assertEqual(self.search('яблоки'), [self.apples, self.apple])
+
+    def test_prefix_and_all_terms(self):
+        """Слова ищутся по началу, и в посте должны быть все слова."""
+        self.assertEqual(self.search('ЯБЛ груш'), [self.apple])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста видны в поиске после фиксации."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apple.text = 'Апельсины'
+            self.apple.save()
+        self.assertEqual(self.search('апельсины'), [self.apple])
+        self.assertEqual(self.search('груши'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apples.delete()
+        self.assertEqual(self.search('яблоки'), [])
+
+    def test_index_waits_for_commit(self):
+        """Индекс обновляет задача, запущенная после фиксации."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(text='Абрикосы', author=self.user)
+        self.assertEqual(self.search('абрикосы'), [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.search('абрикосы'), [post])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(self.search('"яблоки OR* (NEAR'), [])
+        self.assertEqual(self.search('яблоки"'), [self.apples, self.apple])
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не находит."""
+        self.assertEqual(self.search(''), [])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_pagination_keeps_query(self):
+        """Ссылки пагинатора сохраняют поисковый запрос."""
+        response = self.client.get(reverse('posts:search'), {'q': 'яблоки'})
+        self.assertContains(
+            response, '?q=%D1%8F%D0%B1%D0%BB%D0%BE%D0%BA%D0%B8&amp;page=2'
+        )
+        self.assertEqual(
+            self.search('яблоки', page=2), [self.apple]
+        )
+
+    @override_settings(SEARCH_RANK_LIMIT=1)
+    def test_frequent_terms_sorted_by_recency(self):
+        """При множестве совпадений сначала идут новые посты."""
+        self.assertEqual(self.search('яблоки'), [self.apples, self.apple])
+        self.assertEqual(self.search('и'), [self.apples, self.apple])
+
+    def test_rebuild_restores_index(self):
+        """Перестройка индекса подхватывает посты, созданные в обход."""
+        Post.objects.bulk_create([Post(text='Вишня', author=self.user)])
+        self.assertEqual(self.search('вишня'), [])
+        search.get_backend().rebuild()
+        self.assertEqual(len(self.search('вишня')), 1)
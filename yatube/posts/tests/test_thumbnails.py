@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import FALLBACK_MIME, Post
+from .utils import OnCommitMixin
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   TASKS_BACKEND='core.tasks.InlineBackend')
+class ThumbnailTests(OnCommitMixin, TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.post = Post.objects.create(
+            text='Тестовый текст',
+            author=self.user,
+            image=uploaded('small.gif'),
+        )
+
+    def test_page_falls_back_to_original_image(self):
+        """Пока миниатюры нет, страница показывает исходную картинку."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+
+    def test_thumbnail_built_after_commit(self):
+        """Миниатюру строит фоновая задача после фиксации транзакции."""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                text='Новая картинка',
+                author=self.user,
+                image=uploaded('new.gif'),
+            )
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+
+    def test_generate_saves_thumbnail(self):
+        """Готовая миниатюра сохраняется в посте и попадает в ленту."""
+        self.client.get(reverse('posts:index'))
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.thumbnail_url)
+
+    @override_settings(IMAGE_VARIANT_WIDTHS=(480, 960, 1440))
+    def test_variants_follow_source_width(self):
+        """Варианты строятся для ширин не больше исходной картинки."""
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 400), 'white').save(buffer, format='PNG')
+        post = Post.objects.create(
+            text='Широкая картинка',
+            author=self.user,
+            image=SimpleUploadedFile('wide.png', buffer.getvalue()),
+        )
+        thumbnails.generate(post.pk)
+        post.refresh_from_db()
+        fallback = post.variants[FALLBACK_MIME]
+        self.assertEqual([width for width, _ in fallback], [480, 960])
+        self.assertEqual(post.thumbnail, fallback[1][1])
+        self.assertEqual(
+            set(post.variants),
+            {Image.MIME[name] for name in thumbnails.variant_formats()},
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image_srcset)
+
+    def test_new_image_resets_thumbnail(self):
+        """Замена картинки сбрасывает устаревшую миниатюру."""
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        self.post.image = uploaded('other.gif')
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail, '')
+        self.assertEqual(self.post.variants, {})
+
+    def test_new_image_deletes_old_variants_after_commit(self):
+        """Файлы вариантов старой картинки удаляются после фиксации."""
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        old_files = thumbnails.variant_files(self.post)
+        self.assertTrue(old_files)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.image = uploaded('other.gif')
+            self.post.save()
+            for name in old_files:
+                self.assertTrue(default_storage.exists(name))
+        for name in old_files:
+            self.assertFalse(default_storage.exists(name))
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail)
+        self.assertNotIn(self.post.thumbnail, old_files)
+
+    def test_delete_removes_variants(self):
+        """Удаление поста удаляет файлы его вариантов."""
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        files = thumbnails.variant_files(self.post)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_text_edit_keeps_thumbnail(self):
+        """Правка текста не трогает готовую миниатюру."""
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        thumbnail = self.post.thumbnail
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail, thumbnail)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import search
+from ..feed import get_feed
+from ..models import Comment, Follow, Group, Post, PostDay
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            text='Переносимый пост', author=self.author, group=self.group
+        )
+        Post.objects.create(text='Пост без группы', author=self.reader)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def round_trip(self, name):
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', path, stderr=StringIO())
+        call_command(
+            'import_posts', path, batch_size=1, stdout=StringIO()
+        )
+
+    def assertImported(self):
+        self.assertEqual(Post.objects.count(), 4)
+        copy = Post.objects.exclude(pk=self.post.pk).get(
+            text='Переносимый пост'
+        )
+        self.assertEqual(copy.author, self.author)
+        self.assertEqual(copy.group, self.group)
+        self.assertEqual(copy.pub_date, self.post.pub_date)
+        self.assertEqual(copy.comments_count, 1)
+        self.assertEqual(copy.comments.get().text, 'Комментарий')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertIn(copy, get_feed(self.reader))
+        self.assertIn(copy, search.get_backend().search('переносимый')[:10])
+
+    def test_ndjson_round_trip(self):
+        """Выгрузка в NDJSON загружается обратно со связями и счетчиками."""
+        self.round_trip('posts.ndjson')
+        self.assertImported()
+
+    def test_csv_round_trip(self):
+        """Выгрузка в CSV загружается обратно со связями и счетчиками."""
+        self.round_trip('posts.csv')
+        self.assertImported()
+
+    def test_missing_authors_and_groups_created(self):
+        """Неизвестные авторы и группы создаются при загрузке."""
+        path = os.path.join(self.directory, 'new.ndjson')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"model": "post", "id": 1, "author": "newcomer", '
+                '"group": "new-group", "text": "Новый пост", '
+                '"pub_date": "2021-12-01T10:00:00+00:00"}\n'
+            )
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get(text='Новый пост')
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertEqual(post.group.slug, 'new-group')
+        self.assertEqual(post.author.stats.posts_count, 1)
+
+    def test_finish_touches_only_imported_rows(self):
+        """Счетчики и дни пересчитываются только для загруженного."""
+        other = Group.objects.create(title='Другая группа', slug='other')
+        Group.objects.filter(pk=other.pk).update(posts_count=42)
+        day = PostDay.objects.get()
+        self.round_trip('posts.ndjson')
+        other.refresh_from_db()
+        self.assertEqual(other.posts_count, 42)
+        day.refresh_from_db()
+        self.assertEqual(day.posts_count, 4)
+
+    def test_csv_keeps_empty_text(self):
+        """Пустая ячейка CSV — null только в колонках group и image."""
+        Post.objects.create(text='', author=self.author)
+        self.round_trip('posts.csv')
+        self.assertEqual(Post.objects.filter(text='').count(), 2)
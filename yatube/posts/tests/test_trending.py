@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Post, TrendingPost
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.reader = User.objects.create_user(username='TestReader')
+        self.old = self.create_post('Старый пост', days=30)
+        self.fresh = self.create_post('Свежее обсуждение', days=10)
+        self.stale = self.create_post('Давнее обсуждение', days=10)
+        self.quiet = self.create_post('Без комментариев', days=10)
+        self.comment(self.fresh, hours=1, count=2)
+        self.comment(self.stale, hours=30, count=3)
+        self.comment(self.old, hours=24 * 29, count=10)
+
+    def create_post(self, text, days):
+        post = Post.objects.create(text=text, author=self.author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=self.now - timedelta(days=days)
+        )
+        return post
+
+    def comment(self, post, hours, count):
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Комментарий')
+            for _ in range(count)
+        ])
+        Comment.objects.filter(post=post).update(
+            pub_date=self.now - timedelta(hours=hours)
+        )
+
+    def ranking(self):
+        return list(TrendingPost.objects.values_list('post_id', flat=True))
+
+    def test_recent_comments_outweigh_older_ones(self):
+        """Свежие комментарии весят больше давних, посты без обсуждения
+        и комментарии старше окна в рейтинг не попадают."""
+        self.assertEqual(trending.compute(self.now), 2)
+        self.assertEqual(self.ranking(), [self.fresh.pk, self.stale.pk])
+
+    def test_author_followers_lift_new_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        new = self.create_post('Новый пост', days=0)
+        trending.compute(self.now)
+        self.assertIn(new.pk, self.ranking())
+        self.assertNotIn(self.quiet.pk, self.ranking())
+
+    @override_settings(TRENDING_SIZE=1)
+    def test_command_keeps_top_posts(self):
+        call_command('compute_trending', stdout=StringIO())
+        self.assertEqual(self.ranking(), [self.fresh.pk])
+
+    def test_page_reads_ranked_table(self):
+        """Страница — один запрос к рейтингу, без подсчета комментариев."""
+        trending.compute(self.now)
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.fresh, self.stale]
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('posts_comment', queries[0]['sql'])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_cursor_pages(self):
+        trending.compute(self.now)
+        url = reverse('posts:trending')
+        page = self.client.get(url).context['page_obj']
+        self.assertEqual(list(page), [self.fresh])
+        self.assertIsNone(page.previous_cursor())
+        page = self.client.get(
+            url, {'cursor': page.next_cursor()}
+        ).context['page_obj']
+        self.assertEqual(list(page), [self.stale])
+        self.assertIsNone(page.next_cursor())
+        self.assertEqual(page.previous_cursor(), '0')
+
+    def test_deleted_post_leaves_ranking(self):
+        trending.compute(self.now)
+        self.client.get(reverse('posts:trending'))
+        self.fresh.delete()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [self.stale])
@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка числа SQL-запросов, которые выполняет страница."""
+
+    def assertQueryBudget(self, client, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        executed = [query['sql'] for query in queries]
+        self.assertLessEqual(
+            len(executed), budget,
+            f'{url} выполнил {len(executed)} запросов при бюджете '
+            f'{budget}:\n' + '\n'.join(executed)
+        )
+        return response
+
+
+class OnCommitMixin:
+    """Выполнение колбэков on_commit внутри транзакции TestCase.
+
+    TestCase не фиксирует транзакцию, и отложенные задачи без этого
+    не запускаются. Повторяет TestCase.captureOnCommitCallbacks из
+    Django 3.2.
+    """
+
+    @contextmanager
+    def captureOnCommitCallbacks(self, execute=False):
+        callbacks = []
+        start = len(connection.run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            while len(connection.run_on_commit) > start:
+                pending = connection.run_on_commit[start:]
+                del connection.run_on_commit[start:]
+                for _, callback in pending:
+                    callbacks.append(callback)
+                    if execute:
+                        callback()
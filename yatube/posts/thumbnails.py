@@ -0,0 +1,114 @@
+import hashlib
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import cache, feed
+from .models import FALLBACK_MIME, Post
+
+# Кадр карточки поста; варианты других ширин сохраняют пропорцию.
+WIDTH, HEIGHT = 960, 339
+FALLBACK_FORMAT = 'JPEG'
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 80, 'optimize': True, 'progressive': True},
+    'WEBP': {'quality': 75, 'method': 4},
+    'AVIF': {'quality': 60},
+}
+
+
+def variant_formats():
+    """Форматы вариантов, доступные в установленном Pillow."""
+    # Реестр форматов Pillow заполняется лениво: в свежем процессе
+    # воркера он пуст, пока не открыта ни одна картинка.
+    Image.init()
+    modern = [
+        image_format for image_format in settings.IMAGE_VARIANT_FORMATS
+        if image_format in Image.SAVE
+    ]
+    return modern + [FALLBACK_FORMAT]
+
+
+def variant_widths(source_width):
+    # Шире исходника режем только базовый кадр, как и раньше с upscale.
+    return sorted(
+        {WIDTH} | {
+            width for width in settings.IMAGE_VARIANT_WIDTHS
+            if width <= source_width
+        }
+    )
+
+
+def build_variants(post):
+    """Сохраняет кадры картинки поста по ширинам и форматам.
+
+    Возвращает манифест: MIME-тип -> список пар (ширина, файл),
+    резервный JPEG идет последним.
+    """
+    digest = hashlib.md5(post.image.name.encode()).hexdigest()[:12]
+    stem = f'posts/variants/{post.pk}/{digest}'
+    formats = variant_formats()
+    manifest = {Image.MIME[image_format]: [] for image_format in formats}
+    with post.image.open('rb'), Image.open(post.image) as image:
+        # JPEG декодируется сразу в масштабе, достаточном для вариантов.
+        image.draft('RGB', (max(settings.IMAGE_VARIANT_WIDTHS), HEIGHT))
+        image = image.convert('RGB')
+    for width in variant_widths(image.width):
+        size = (width, round(width * HEIGHT / WIDTH))
+        frame = ImageOps.fit(image, size, Image.LANCZOS)
+        for image_format in formats:
+            buffer = BytesIO()
+            frame.save(buffer, image_format, **SAVE_OPTIONS[image_format])
+            name = default_storage.save(
+                f'{stem}-{width}.{image_format.lower()}',
+                ContentFile(buffer.getvalue()),
+            )
+            manifest[Image.MIME[image_format]].append([width, name])
+    return manifest
+
+
+def delete_variants(manifest):
+    for files in manifest.values():
+        for _, name in files:
+            default_storage.delete(name)
+
+
+def variant_files(post):
+    """Файлы вариантов и миниатюры поста."""
+    names = [name for files in post.variants.values() for _, name in files]
+    if post.thumbnail and post.thumbnail not in names:
+        names.append(post.thumbnail)
+    return names
+
+
+def delete_files(names):
+    """Удаляет файлы, которые больше не нужны посту."""
+    for name in names:
+        default_storage.delete(name)
+
+
+def generate(post_id):
+    """Строит варианты картинки поста и сохраняет манифест в записи."""
+    post = (
+        Post.objects.filter(pk=post_id)
+        .only('image', 'image_variants', 'author_id', 'group_id').first()
+    )
+    if post is None or not post.image:
+        return
+    manifest = build_variants(post)
+    fallback = dict(manifest[FALLBACK_MIME])[WIDTH]
+    # Картинку могли заменить, пока строились варианты старой.
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail=fallback, image_variants=json.dumps(manifest)
+    )
+    if not updated:
+        delete_variants(manifest)
+        return
+    delete_variants(post.variants)
+    cache.bump(
+        cache.post_scope(post_id),
+        *cache.post_scopes(post, [post.group_id], feed.readers(post)),
+    )
@@ -0,0 +1,243 @@
+import csv
+import json
+import time
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from core.models import explicit_pub_date
+
+from . import cache, counters, feed, search
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('ndjson', 'csv')
+FIELDS = (
+    'model', 'id', 'author', 'group', 'post', 'user', 'text', 'pub_date',
+    'image',
+)
+# Строк в одном INSERT: Django 2.2 собирает его для SQLite через
+# UNION ALL, а SQLite ограничивает такой запрос 500 частями.
+INSERT_ROWS = 500
+# Сколько id авторов передается в один запрос IN при поиске читателей.
+READERS_CHUNK = 500
+# Колонки, где пустая ячейка CSV означает null; в остальных это
+# пустая строка.
+NULLABLE_FIELDS = ('group', 'image')
+
+
+def guess_format(path):
+    return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+def export_records():
+    """Посты, затем комментарии и подписки в виде словарей.
+
+    Строки читаются итератором, поэтому память не зависит от объема базы.
+    Авторы и группы записываются по username и slug.
+    """
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, author, group, text, pub_date, image in posts.iterator():
+        yield {
+            'model': 'post', 'id': pk, 'author': author, 'group': group,
+            'text': text, 'pub_date': pub_date.isoformat(), 'image': image,
+        }
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'text', 'pub_date'
+    )
+    for pk, post_id, author, text, pub_date in comments.iterator():
+        yield {
+            'model': 'comment', 'id': pk, 'post': post_id, 'author': author,
+            'text': text, 'pub_date': pub_date.isoformat(),
+        }
+    follows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username'
+    )
+    for user, author in follows.iterator():
+        yield {'model': 'follow', 'user': user, 'author': author}
+
+
+def write_records(stream, records, file_format):
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, FIELDS, restval='')
+        writer.writeheader()
+        writer.writerows(records)
+        return
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def read_records(stream, file_format):
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            # В CSV нет null: в nullable-колонках его пишут пустой ячейкой.
+            yield {
+                key: None if key in NULLABLE_FIELDS and not value else value
+                for key, value in row.items()
+            }
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Importer:
+    """Загружает записи экспорта пачками через bulk_create.
+
+    Пользователи и группы ищутся по таблицам в памяти, недостающие
+    создаются. id постов сдвигаются за последний id в базе, чтобы
+    комментарии находили свои посты без таблицы соответствия.
+    Сигналы при массовой записи не срабатывают, поэтому в конце
+    обновляются счетчики, ленты, поисковый индекс и версии кеша —
+    только для загруженных постов и затронутых авторов и групп.
+    """
+
+    def __init__(self, batch_size, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.post_shift = Post.objects.aggregate(
+            last=Max('pk')
+        )['last'] or 0
+        self.pending = {Post: [], Comment: [], Follow: []}
+        self.counts = {Post: 0, Comment: 0, Follow: 0}
+        self.last_post_id = self.post_shift
+        self.authors = set()
+        self.followers = set()
+        self.touched_groups = set()
+        self.started = time.monotonic()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rate(self):
+        return self.total / max(self.elapsed(), 1e-6)
+
+    def user_id(self, username):
+        if username not in self.users:
+            self.users[username] = User.objects.get_or_create(
+                username=username
+            )[0].pk
+        return self.users[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            self.groups[slug] = Group.objects.get_or_create(
+                slug=slug, defaults={'title': slug}
+            )[0].pk
+        return self.groups[slug]
+
+    def build(self, record):
+        model = record['model']
+        if model == 'post':
+            author_id = self.user_id(record['author'])
+            group_id = self.group_id(record.get('group'))
+            pk = int(record['id']) + self.post_shift
+            self.authors.add(author_id)
+            self.touched_groups.add(group_id)
+            self.last_post_id = max(self.last_post_id, pk)
+            return Post(
+                pk=pk,
+                author_id=author_id,
+                group_id=group_id,
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                image=record.get('image') or '',
+            )
+        if model == 'comment':
+            return Comment(
+                post_id=int(record['post']) + self.post_shift,
+                author_id=self.user_id(record['author']),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+            )
+        if model == 'follow':
+            author_id = self.user_id(record['author'])
+            user_id = self.user_id(record['user'])
+            self.authors.add(author_id)
+            self.followers.add(user_id)
+            return Follow(user_id=user_id, author_id=author_id)
+        raise ValueError(f'Неизвестный тип записи: {model}')
+
+    def add(self, record):
+        instance = self.build(record)
+        batch = self.pending[type(instance)]
+        batch.append(instance)
+        if len(batch) >= self.batch_size:
+            self.flush(type(instance))
+
+    def flush(self, model):
+        batch = self.pending[model]
+        if not batch:
+            return
+        # Комментарии ссылаются на посты: посты пишутся раньше.
+        if model is Comment:
+            self.flush(Post)
+        with transaction.atomic(), explicit_pub_date(Post, Comment):
+            model.objects.bulk_create(
+                batch, batch_size=INSERT_ROWS, ignore_conflicts=model is Follow
+            )
+        self.counts[model] += len(batch)
+        self.pending[model] = []
+        if self.progress:
+            self.progress(self)
+
+    def run(self, records):
+        for record in records:
+            self.add(record)
+        for model in self.pending:
+            self.flush(model)
+        self.finish()
+
+    def finish(self):
+        if self.counts[Post]:
+            self.reset_sequence()
+        # Новые посты получили id после последнего в базе.
+        posts = Post.objects.filter(
+            pk__gt=self.post_shift, pk__lte=self.last_post_id
+        )
+        with transaction.atomic():
+            counters.refresh(
+                self.authors | self.followers,
+                self.touched_groups - {None},
+                posts,
+            )
+            search.get_backend().index_many(posts)
+        for author_id in self.authors:
+            with transaction.atomic():
+                feed.sync_author(author_id)
+        authors = sorted(self.authors)
+        readers = set()
+        for start in range(0, len(authors), READERS_CHUNK):
+            readers.update(
+                Follow.objects.filter(
+                    author_id__in=authors[start:start + READERS_CHUNK]
+                ).values_list('user_id', flat=True)
+            )
+        scopes = [cache.INDEX, cache.PULL_FEEDS]
+        scopes += [cache.profile_scope(pk) for pk in self.authors]
+        scopes += [
+            cache.group_scope(pk)
+            for pk in self.touched_groups if pk is not None
+        ]
+        scopes += [cache.feed_scope(pk) for pk in readers]
+        scopes += [cache.following_scope(pk) for pk in readers]
+        cache.bump(*scopes)
+
+    def reset_sequence(self):
+        # Посты записаны с явными id: счетчик последовательности в базах,
+        # где он отделен от таблицы, надо передвинуть.
+        statements = connection.ops.sequence_reset_sql(no_style(), [Post])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
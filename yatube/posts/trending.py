@@ -0,0 +1,78 @@
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from . import cache
+from .models import Comment, Post, TrendingPost
+
+
+def decay(age, half_life):
+    """Вес события возраста age: вдвое меньше каждые half_life."""
+    return 0.5 ** (max(age, timedelta(0)) / half_life)
+
+
+def comment_scores(since, now, half_life):
+    """Сумма весов свежих комментариев по постам.
+
+    Комментарии группируются по часам одним агрегирующим запросом,
+    так что в Python приходит не больше строки на пост и час.
+    """
+    rows = (
+        Comment.objects.filter(pub_date__gte=since)
+        .annotate(hour=TruncHour('pub_date'))
+        .values_list('post_id', 'hour')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    scores = defaultdict(float)
+    for post_id, hour, total in rows:
+        scores[post_id] += total * decay(now - hour, half_life)
+    return scores
+
+
+def compute(now=None):
+    """Пересчитывает рейтинг «Популярное»; возвращает число мест.
+
+    Вес поста — затухающая сумма комментариев за TRENDING_WINDOW и
+    популярность автора (логарифм числа подписчиков), затухающая
+    с возрастом поста. В рейтинг попадают TRENDING_SIZE лучших постов
+    из опубликованных или обсуждавшихся за окно.
+    """
+    now = now or timezone.now()
+    since = now - settings.TRENDING_WINDOW
+    half_life = settings.TRENDING_HALF_LIFE
+    comments = comment_scores(since, now, half_life)
+    candidates = Post.objects.filter(
+        Q(pub_date__gte=since)
+        | Q(pk__in=Comment.objects.filter(pub_date__gte=since)
+            .values('post_id'))
+    ).values_list('pk', 'pub_date', 'author__stats__followers_count')
+    scored = (
+        (
+            comments.get(pk, 0.0)
+            + settings.TRENDING_FOLLOW_WEIGHT
+            * math.log1p(followers or 0)
+            * decay(now - pub_date, half_life),
+            pk,
+        )
+        for pk, pub_date, followers in candidates.iterator()
+    )
+    top = heapq.nlargest(
+        settings.TRENDING_SIZE, (item for item in scored if item[0] > 0)
+    )
+    rows = [
+        TrendingPost(post_id=pk, rank=rank, score=score)
+        for rank, (score, pk) in enumerate(top, start=1)
+    ]
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(rows)
+    cache.bump(cache.TRENDING)
+    return len(rows)
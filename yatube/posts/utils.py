@@ -1,12 +1,214 @@
+import collections.abc
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import F
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Comment
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def seek(queryset, pub_date, pk, direction, key='pk'):
+    """Строки queryset после ключа (pub_date, pk) в направлении direction.
+
+    Условие записано как диапазон по pub_date, чтобы база могла искать
+    по индексу (..., pub_date, key), а не сканировать его.
+    """
+    if direction == FORWARD:
+        return queryset.filter(pub_date__lte=pub_date).exclude(
+            **{'pub_date': pub_date, f'{key}__gte': pk}
+        )
+    return queryset.filter(pub_date__gte=pub_date).exclude(
+        **{'pub_date': pub_date, f'{key}__lte': pk}
+    ).order_by('pub_date', key)
+
+
+class KeysetPaginator(Paginator):
+    """Постраничная навигация по ключу (pub_date, id).
+
+    Курсорные страницы строятся без COUNT и OFFSET, поэтому глубокие
+    страницы стоят столько же, сколько первая. Номерные страницы
+    (?page=N) по-прежнему доступны через get_page().
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list.order_by('-pub_date', '-pk'), per_page, **kwargs
+        )
+
+    @staticmethod
+    def encode_cursor(obj, direction):
+        raw = f'{direction}{obj.pub_date.isoformat()}|{obj.pk}'
+        return urlsafe_base64_encode(raw.encode())
+
+    @staticmethod
+    def decode_cursor(token):
+        """Возвращает (direction, pub_date, pk) или None для битого курсора."""
+        try:
+            raw = force_str(urlsafe_base64_decode(token))
+            direction, raw = raw[0], raw[1:]
+            pub_date, pk = raw.rsplit('|', 1)
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (ValueError, TypeError, IndexError, UnicodeDecodeError):
+            return None
+        if direction not in (FORWARD, BACKWARD) or pub_date is None:
+            return None
+        return direction, pub_date, pk
+
+    def _seek(self, pub_date, pk, direction):
+        return seek(self.object_list, pub_date, pk, direction)
+
+    def _fetch(self, cursor=None):
+        """Строки страницы и еще одна, чтобы узнать о следующей.
+
+        cursor — (pub_date, pk, direction); без него берется начало списка.
+        """
+        if cursor is None:
+            rows = self.object_list
+        else:
+            rows = self._seek(*cursor)
+        return list(rows[:self.per_page + 1])
+
+    def _cursor_page(self, fetch):
+        window = CursorWindow(fetch)
+        page = self._get_page(window, 1, self)
+        page.is_cursor = True
+        page.next_cursor = window.next_cursor
+        page.previous_cursor = window.previous_cursor
+        return page
+
+    def _first_rows(self):
+        rows = self._fetch()
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1], FORWARD)
+        return rows, next_cursor, None
+
+    def _seek_rows(self, direction, pub_date, pk):
+        rows = self._fetch((pub_date, pk, direction))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BACKWARD:
+            if not has_more:
+                return self._first_rows()
+            rows.reverse()
+            return (
+                rows,
+                self.encode_cursor(rows[-1], FORWARD),
+                self.encode_cursor(rows[0], BACKWARD),
+            )
+        if not rows:
+            return rows, None, None
+        return (
+            rows,
+            self.encode_cursor(rows[-1], FORWARD) if has_more else None,
+            self.encode_cursor(rows[0], BACKWARD),
+        )
+
+    def first_page(self):
+        return self._cursor_page(self._first_rows)
+
+    def get_cursor_page(self, token):
+        """Страница после (или до) курсора; без курсора — первая.
+
+        Запрос выполняется при первом обращении к строкам или курсорам,
+        поэтому страница, отданная из кеша фрагментов, не стоит запроса.
+        """
+        cursor = self.decode_cursor(token) if token else None
+        if cursor is None:
+            return self.first_page()
+        return self._cursor_page(lambda: self._seek_rows(*cursor))
+
+
+class CursorWindow(collections.abc.Sequence):
+    """Строки курсорной страницы и курсоры соседних страниц."""
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._result = None
+
+    def _evaluate(self):
+        if self._result is None:
+            self._result = self._fetch()
+        return self._result
+
+    def __getitem__(self, index):
+        return self._evaluate()[0][index]
+
+    def __len__(self):
+        return len(self._evaluate()[0])
+
+    def next_cursor(self):
+        return self._evaluate()[1]
+
+    def previous_cursor(self):
+        return self._evaluate()[2]
 
 
 def get_paginator(queryset, request):
-    paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
+    return paginate(
+        KeysetPaginator(queryset, settings.POSTS_PER_PAGE), request
+    )
+
+
+def paginate(paginator, request):
+    """Номерная (?page) или курсорная (?cursor) страница paginator."""
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get('cursor')
+    if page_number is not None:
+        page_obj = paginator.get_page(page_number)
+    else:
+        page_obj = paginator.get_cursor_page(cursor)
     return {
         'page_obj': page_obj,
         'page_number': page_number,
+        'cursor': cursor,
     }
+
+
+def get_ranked_page(queryset, rank_field, cursor, per_page):
+    """Курсорная страница рейтинга после места cursor.
+
+    Страница — один запрос по индексу поля места rank_field, без COUNT
+    и OFFSET; курсор — последнее место предыдущей страницы.
+    """
+    try:
+        start = max(int(cursor), 0)
+    except (TypeError, ValueError):
+        start = 0
+
+    def fetch():
+        rows = list(
+            queryset.filter(**{f'{rank_field}__gt': start})
+            .annotate(rank=F(rank_field))
+            .order_by(rank_field)[:per_page + 1]
+        )
+        next_cursor = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_cursor = str(rows[-1].rank)
+        previous_cursor = str(max(start - per_page, 0)) if start else None
+        return rows, next_cursor, previous_cursor
+
+    paginator = Paginator(queryset, per_page)
+    page = paginator._get_page(CursorWindow(fetch), 1, paginator)
+    page.is_cursor = True
+    page.next_cursor = page.object_list.next_cursor
+    page.previous_cursor = page.object_list.previous_cursor
+    return page
+
+
+def get_comments_page(post_id, cursor=None):
+    """Курсорная страница комментариев поста, от новых к старым."""
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+    )
+    return paginator.get_cursor_page(cursor)
@@ -1,62 +1,117 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import cache, following, search, suggestions
+from .counters import followers_count, following_count, posts_count
+from .feed import FeedPaginator
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import get_paginator
+from .models import Follow, Group, Post, User
+from .utils import (get_comments_page, get_paginator, get_ranked_page,
+                    paginate)
 
 
+@cache.conditional(cache.scopes_for_index, per_user=True)
 def index(request):
     context = get_paginator(
-        Post.objects.select_related('group').all(),
+        Post.objects.for_feed(),
         request)
+    context.update(cache.fragment_context(cache.INDEX))
     return render(request, 'posts/index.html', context)
 
 
+@cache.conditional(cache.scopes_for_trending, per_user=True)
+def trending(request):
+    cursor = request.GET.get('cursor')
+    context = {
+        'page_obj': get_ranked_page(
+            Post.objects.for_feed(), 'trending__rank', cursor,
+            settings.POSTS_PER_PAGE,
+        ),
+        'cursor': cursor,
+    }
+    context.update(cache.fragment_context(cache.INDEX, cache.TRENDING))
+    return render(request, 'posts/trending.html', context)
+
+
+@cache.conditional(cache.scopes_for_group, per_user=True)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
     }
     context.update(get_paginator(
-        Post.objects.filter(group=group),
+        Post.objects.for_feed().filter(group=group),
         request)
     )
+    context.update(cache.fragment_context(cache.group_scope(group.pk)))
     return render(request, 'posts/group_list.html', context)
 
 
+@cache.conditional(cache.scopes_for_profile_page, per_user=True)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    num_post = Post.objects.filter(author__username=username).count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     context = {
         'author': author,
-        'following': following,
-        'num_post': num_post,
+        'following': following.is_following(request.user, author.pk),
+        'num_post': posts_count(author),
+        'num_followers': followers_count(author),
+        'num_following': following_count(author),
+        'suggestions': suggestions.for_user(
+            request.user, settings.SUGGESTIONS_LIMIT, exclude=author.pk
+        ),
     }
     context.update(get_paginator(
-        Post.objects.filter(author__username=username),
+        Post.objects.for_feed().filter(author=author),
         request)
     )
+    context.update(cache.fragment_context(cache.profile_scope(author.pk)))
     return render(request, 'posts/profile.html', context)
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    results = search.get_backend().search(query)
+    paginator = Paginator(results, settings.POSTS_PER_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@cache.conditional(cache.scopes_for_post_page, per_user=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comment = Comment.objects.filter(post_id=post.id)
-    num_post = Post.objects.filter(author__username=post.author).count()
     context = {
         'post': post,
-        'num_post': num_post,
-        'comments': comment,
+        'num_post': posts_count(post.author),
+        'comments': get_comments_page(post.pk, request.GET.get('cursor')),
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cache.conditional(cache.scopes_for_post)
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML для подгрузки."""
+    comments = get_comments_page(post_id, request.GET.get('cursor'))
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {'post_id': post_id, 'comments': comments, 'fragment': True}
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -104,9 +159,12 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    context = get_paginator(
-        Post.objects.filter(author__following__user=request.user),
-        request)
+    context = paginate(
+        FeedPaginator(request.user, settings.POSTS_PER_PAGE), request
+    )
+    context.update(cache.fragment_context(
+        cache.feed_scope(request.user.pk), cache.PULL_FEEDS
+    ))
     return render(request, 'posts/follow.html', context)
 
 
@@ -118,6 +176,7 @@ def profile_follow(request, username):
             user_id=request.user.id,
             author_id=user.id
         )
+        following.forget(request.user)
     return redirect('posts:profile', username=username)
 
 
@@ -125,4 +184,5 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     user = get_object_or_404(User, username=username)
     Follow.objects.filter(user_id=request.user.id, author_id=user.id).delete()
+    following.forget(request.user)
     return redirect('posts:profile', username=username)
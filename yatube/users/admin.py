@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from core.admin import EstimatedCountPaginator, PrefixSearchMixin
+
+User = get_user_model()
+
+
+class UserAdmin(PrefixSearchMixin, BaseUserAdmin):
+    """Пользователи с поиском по началу имени в автодополнении авторов
+    и читателей; список ищет по стандартным полям UserAdmin."""
+
+    prefix_search_fields = ('username',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+admin.site.unregister(User)
+admin.site.register(User, UserAdmin)
@@ -0,0 +1,102 @@
+import secrets
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+
+
+def _cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'user-snapshot-version:{user_id}'
+
+
+def _version(user_id):
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), secrets.token_hex(6), None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def _key(user_id):
+    return f'user-snapshot:{user_id}:{_version(user_id)}'
+
+
+def _bump(user_id):
+    _cache().set(_version_key(user_id), secrets.token_hex(6), None)
+
+
+def forget(user_id):
+    """Сбрасывает снимок пользователя во всех его сессиях.
+
+    Меняется версия в ключе снимка, а не удаляется сам снимок: запрос,
+    прочитавший пользователя из базы до изменения, запишет его под
+    старой версией, и этот снимок уже никто не прочитает. Версия
+    меняется еще раз после фиксации транзакции — на случай чтения
+    незафиксированных данных до нее.
+    """
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def _session_user(session):
+    """id и бэкенд пользователя сессии или None."""
+    try:
+        user_id = get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+        backend = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return None
+    if backend not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    return user_id, backend
+
+
+def _snapshot(session, key, backend):
+    """Пользователь сессии из кеша, если снимок еще действителен.
+
+    Снимок хранит хеш пароля, поэтому сверка с хешем в сессии работает
+    так же, как в django.contrib.auth.get_user: сессия, открытая до смены
+    пароля, снимок не получит.
+    """
+    user = _cache().get(key)
+    if user is None:
+        return None
+    session_hash = session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        return None
+    user.backend = backend
+    return user
+
+
+def get_user(request):
+    """Пользователь запроса: из снимка в кеше, при промахе — из базы.
+
+    Загруженный из базы пользователь кладется в кеш сессий на
+    USER_SNAPSHOT_TIMEOUT секунд под ключом с его id и версией, общим
+    для всех его сессий: смена пароля, правка пользователя и выход
+    меняют версию и сбрасывают снимок сразу везде. Версия читается до
+    загрузки из базы, поэтому снимок, загруженный до сброса, ляжет под
+    устаревший ключ.
+    """
+    session_user = _session_user(request.session)
+    if session_user is None:
+        return auth.get_user(request)
+    user_id, backend = session_user
+    key = _key(user_id)
+    user = _snapshot(request.session, key, backend)
+    if user is not None:
+        return user
+    user = auth.get_user(request)
+    if user.is_authenticated and user.pk == user_id:
+        _cache().set(key, user, settings.USER_SNAPSHOT_TIMEOUT)
+    return user
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -53,11 +54,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -72,7 +74,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -153,11 +155,141 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # for paginator
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+# for follow feed: authors with more followers are merged on read
+FEED_FANOUT_LIMIT = 1000
+
+FEED_BATCH_SIZE = 500
+
+# newest posts copied into a new follower's feed during the request;
+# the rest are backfilled by a background task
+FEED_BACKFILL_LIMIT = 200
+
+# "who to follow": top authors per user, precomputed by
+# manage.py compute_suggestions
+SUGGESTIONS_LIMIT = 5
+
+# "trending": posts ranked by recent comments and author followers,
+# both halving every TRENDING_HALF_LIFE; manage.py compute_trending
+# rebuilds the table of the TRENDING_SIZE best posts
+TRENDING_WINDOW = timedelta(hours=48)
+TRENDING_HALF_LIFE = timedelta(hours=6)
+TRENDING_FOLLOW_WEIGHT = 0.5
+TRENDING_SIZE = 100
+
+# admin changelists: exact counts are cached, and PostgreSQL tables
+# with at least ADMIN_ESTIMATE_MIN_ROWS rows show the planner estimate
+ADMIN_COUNT_TIMEOUT = 60
+ADMIN_ESTIMATE_MIN_ROWS = 100000
+
+# slow side effects (thumbnails, search index) go through an outbox table
+# and run after commit: ThreadPoolBackend runs them in TASK_WORKERS
+# threads of the process, OutboxBackend only in manage.py run_workers,
+# InlineBackend in the request thread (the default of settings_test).
+# run_workers also finishes tasks left behind by a stopped process;
+# failed tasks are retried with exponential backoff
+TASKS_BACKEND = os.getenv('TASKS_BACKEND', 'core.tasks.ThreadPoolBackend')
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 4))
+TASK_LEASE = 300
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+
+# widths of responsive post image variants; formats missing in Pillow
+# are skipped and JPEG is always built as the fallback
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP')
+
+# limits for post images, checked from the file header before decoding
+IMAGE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 10 ** 6
+
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# accepted images are re-encoded to fit this box
+IMAGE_MAX_SIZE = (1920, 1920)
+
+# full-text search over posts; posts.search.DatabaseSearchBackend works on
+# any database without an index
+POSTS_SEARCH_BACKEND = 'posts.search.SQLiteFTS5Backend'
+
+# more matches than this are ordered by recency instead of BM25 rank
+SEARCH_RANK_LIMIT = 10000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# fragments are invalidated by version bumps, the timeout only bounds memory
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Shared cache: fragments and sessions must be visible to every worker.
+# The file default keeps them in CACHE_LOCATION on a local disk, redis and
+# memcached point CACHE_LOCATION at a server (django-redis or
+# python-memcached must be installed). locmem is per process: only
+# settings_test uses it by default.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'file')
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+
+
+def shared_cache(name, backend=None):
+    backend = backend or CACHE_BACKEND
+    config = {
+        'BACKEND': CACHE_BACKENDS[backend],
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': name,
     }
+    if backend in ('locmem', 'file'):
+        config['LOCATION'] = os.path.join(CACHE_LOCATION, name)
+        config['OPTIONS'] = {'MAX_ENTRIES': 10000}
+    return config
+
+
+CACHES = {
+    'default': shared_cache('default'),
+    'sessions': shared_cache('sessions'),
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+# request.user is read from a snapshot in the sessions cache, keyed by
+# user id and a version that save, password change and logout replace
+USER_SNAPSHOT_TIMEOUT = 60
+
+# stampede guard for cached fragments: one worker rebuilds an expiring
+# fragment, the rest keep serving the old copy or wait for the new one
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 2
+CACHE_EARLY_REFRESH_BETA = 1.0
+
+# per-view metrics: every request is timed, a METRICS_SAMPLE_RATE share of
+# them also counts queries, template time and cache hits. /metrics/ serves
+# the counters to Prometheus from METRICS_ALLOWED_IPS only; sampled requests
+# are logged as JSON by the core.metrics logger when METRICS_LOG_LEVEL=INFO
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.05'))
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+METRICS_PREFIX = 'yatube'
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
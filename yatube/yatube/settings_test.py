@@ -0,0 +1,21 @@
+"""
+Settings for the test runs: manage.py test and pytest load them
+instead of yatube.settings.
+
+Tasks run inline after commit, so the upstream pytest suite never leaves
+pool threads behind; tests that rely on inline execution still pin it
+with override_settings. Caches are per-process locmem, so test runs do
+not share state through CACHE_LOCATION.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import shared_cache
+
+TASKS_BACKEND = os.getenv('TASKS_BACKEND', 'core.tasks.InlineBackend')
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': shared_cache('default', CACHE_BACKEND),
+    'sessions': shared_cache('sessions', CACHE_BACKEND),
+}